@@ -0,0 +1,39 @@
+from elevator_playground import benchmarks
+import sys
+
+
+def run_benchmark():
+    """Benchmark the fixed scenario matrix and compare with a baseline.
+
+    Usage: python benchmark.py [results.json [baseline.json]]
+
+    Results are written to results.json (benchmark.json by default). If a
+    baseline is given, regressions are listed and the exit status is 1 when
+    there are any.
+    """
+    results_path = sys.argv[1] if len(sys.argv) > 1 else "benchmark.json"
+    baseline_path = sys.argv[2] if len(sys.argv) > 2 else None
+
+    rows = []
+    for row in benchmarks.run():
+        rows.append(row)
+        print(f"{benchmarks.scenario_key(row)}: "
+              f"{row['events_per_sec']:.0f} events/s, "
+              f"{row['wall_time']:.2f} s, "
+              f"avg wait {row['avg_wait']} s")
+        sys.stdout.flush()
+    benchmarks.save(rows, results_path)
+
+    if baseline_path is not None:
+        regressions = benchmarks.compare(rows, benchmarks.load(baseline_path))
+        for regression in regressions:
+            print(f"REGRESSION {regression['scenario']}: "
+                  f"{regression['metric']} {regression['baseline']} -> "
+                  f"{regression['value']} ({regression['change']:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -2,5 +2,6 @@ __all__ = [
     "elevators",
     "buildings",
     "session",
+    "tracing",
     "utils",
 ]
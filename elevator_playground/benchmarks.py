@@ -0,0 +1,173 @@
+"""Benchmarks of simulator throughput and dispatching quality.
+
+A benchmark runs a fixed matrix of scenarios (SCENARIOS, configurations as
+in the sweeps module) one after another, each in a fresh worker process, so
+that peak memory is measured per scenario and timings do not compete for
+the CPU. Each scenario is simulated several times, and timings are taken
+from the fastest repetition. Every result row holds the configuration, the
+session metrics (see sessions.Session.metrics) and the engine metrics
+
+    wall_time      -- seconds spent simulating (fastest repetition)
+    events         -- number of simulation events processed (counted in an
+                      untimed run)
+    events_per_sec -- events processed per second of wall time
+    calls_per_sec  -- calls completed per second of wall time
+    peak_rss       -- peak resident memory of the worker in kilobytes (None
+                      where the resource module is unavailable)
+
+Results are saved as JSON, and compare() checks them against the results of
+an earlier benchmark, flagging every metric that got worse.
+"""
+
+
+import functools
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+from elevator_playground import profiling
+from elevator_playground import sessions
+from elevator_playground import sweeps
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+SCENARIOS = sweeps.grid(num_floors=[10, 40],
+                        num_elevators=[2, 8],
+                        runtime=[144000],
+                        dispatcher=["random", "eta"],
+                        traffic=["uniform"],
+                        rate=[600, 2400],
+                        seed=[1])
+
+
+# -- Metrics compared against a baseline --
+# Each maps to 1 if higher values are better, -1 if lower values are. Engine
+# metrics vary from run to run, service metrics do not (scenarios are
+# seeded), hence their separate tolerances.
+ENGINE_METRICS = {"events_per_sec": 1, "calls_per_sec": 1, "wall_time": -1,
+                  "peak_rss": -1}
+SERVICE_METRICS = {"avg_wait": -1, "max_wait": -1, "p95_wait": -1,
+                   "avg_process": -1, "max_process": -1, "completed": 1}
+# ----
+
+
+def run_scenario(config, repeat=1):
+    """Simulate a single scenario repeat times and return its result row."""
+    wall_time = None
+    for _ in range(repeat):
+        building = sweeps.make_building(config)
+        session = sessions.Session(building, config["runtime"])
+        start = time.perf_counter()
+        session.run(verbose=False)
+        elapsed = time.perf_counter() - start
+        if wall_time is None or elapsed < wall_time:
+            wall_time = elapsed
+    row = dict(config)
+    row.update(session.metrics())
+    row["wall_time"] = wall_time
+    row["events"] = _count_events(config)
+    row["events_per_sec"] = row["events"] / wall_time
+    row["calls_per_sec"] = row["completed"] / wall_time
+    row["peak_rss"] = _peak_rss()
+    return row
+
+
+def _count_events(config):
+    """Return the number of events processed when simulating config.
+
+    Events are counted in one more run, kept out of the timings, which
+    gives the same count as every other since simulations are
+    deterministic.
+    """
+    building = sweeps.make_building(config)
+    counter = profiling.EventCounter()
+    counter.attach(building.env)
+    try:
+        sessions.Session(building, config["runtime"]).run(verbose=False)
+    finally:
+        counter.detach()
+    return counter.processed
+
+
+def _peak_rss():
+    """Return the peak resident memory of this process in kilobytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # Reported in bytes rather than kilobytes
+        peak //= 1024
+    return peak
+
+
+def run(scenarios=SCENARIOS, repeat=3):
+    """Benchmark each scenario in turn and yield its result row.
+
+    repeat -- number of times each scenario is simulated
+    """
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for row in pool.imap(functools.partial(run_scenario, repeat=repeat),
+                             scenarios):
+            yield row
+
+
+def scenario_key(row):
+    """Return a string identifying the scenario of a result row."""
+    key = ",".join(f"{key}={row[key]}" for key in sweeps.CONFIG_KEYS)
+    if row.get("engine", "simpy") != "simpy":
+        key += f",engine={row['engine']}"
+    return key
+
+
+def save(rows, path):
+    """Write result rows to a JSON file, along with the platform used."""
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": rows,
+    }
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+
+
+def load(path):
+    """Return the result rows saved in a JSON file."""
+    with open(path) as f:
+        return json.load(f)["scenarios"]
+
+
+def compare(rows, baseline, tolerance=0.2, service_tolerance=0.0):
+    """Return the regressions of result rows against baseline rows.
+
+    tolerance         -- relative change of engine metrics tolerated
+    service tolerance -- relative change of service metrics tolerated
+
+    Each regression is a dictionary with the scenario key, the metric, its
+    baseline value, its new value and its relative change. Scenarios
+    missing from either side are skipped.
+    """
+    baseline = {scenario_key(row): row for row in baseline}
+    regressions = []
+    for row in rows:
+        key = scenario_key(row)
+        if key not in baseline:
+            continue
+        for metrics, allowed in ((ENGINE_METRICS, tolerance),
+                                 (SERVICE_METRICS, service_tolerance)):
+            for metric, sign in metrics.items():
+                old = baseline[key].get(metric)
+                new = row.get(metric)
+                if old is None or new is None or old == 0:
+                    continue
+                change = (new - old) / abs(old)
+                if change * sign < -allowed:
+                    regressions.append({"scenario": key, "metric": metric,
+                                        "baseline": old, "value": new,
+                                        "change": change})
+    return regressions
@@ -1,43 +1,218 @@
+import bisect
+import itertools
+import random
+
 import simpy
-from random import randint
-from elevator_playground.elevators import Elevator
-from elevator_playground.utils import print_status, rand_call
+from elevator_playground.callstore import CallStore
+from elevator_playground.elevators import (CallManager, Elevator,
+                                          ServiceRangeError)
+from elevator_playground.kernel import new_store
+from elevator_playground.metrics import CallMetrics
+from elevator_playground.snapshots import attached_store, detached_state
+from elevator_playground.tracing import NullTracer, INFO
+from elevator_playground.traffic import TrafficError
+from elevator_playground.utils import Call, call_id_generator, rand_call, UP
 from abc import ABC, abstractmethod
 
 
 class Building(ABC):
-    """A building containing elevators that handles generated calls."""
-    def __init__(self, num_floors, num_elevators):
+    """A building containing elevators that handles generated calls.
+
+    Subclasses may override call_manager_cls to change how elevators
+    maintain their unhandled calls (e.g. elevators.BitsetCallManager for tall
+    buildings).
+    """
+    call_manager_cls = CallManager
+
+    def __init__(self, num_floors, num_elevators, seed=None,
+                 keep_history=True, columnar=False, traffic=None,
+                 capacity=simpy.core.Infinity, env=None, name=None,
+                 parking=None):
         """Create a building with specified number of floors and elevators.
 
-        env            -- simpy.Environment instance that runs the simulation
+        env            -- simpy.Environment (or kernel.Environment) instance
+                          that runs the simulation (a new simpy.Environment
+                          unless given, e.g. shared by several banks of
+                          elevators simulated together)
+        name           -- name of the building (or bank), or None
         call generator -- simpy process for generating calls
         call assigner  -- simpy process for assigning calls
         call queue     -- queue for holding generated calls yet to be assigned
-        call history   -- list of all calls that have been generated
+        call history   -- list of all calls that have been generated (left
+                          empty unless keep_history is True), or a
+                          callstore.CallStore if columnar is True
+        keep history   -- if False, generated calls are only accounted for in
+                          metrics, keeping memory use bounded (ignored if
+                          columnar is True)
+        call factory   -- callable creating calls, taking the same arguments
+                          as utils.Call
+        metrics        -- metrics.CallMetrics instance that every generated
+                          call reports to
+        traffic        -- traffic source (see traffic module) that calls are
+                          generated from, or None for the building's own
+                          call generation
+        capacity       -- maximum number of passengers in each elevator
+        parking        -- parking policy (see parking module) choosing where
+                          idle elevators wait, or None to leave them where
+                          they last stopped
         num floors     -- number of floors in building
         num elevators  -- number of elevators in building
         elevators      -- list of elevator instances contained in building
         service ranges -- dictionary mapping each elevator to the floors that
                           they are able to access
+        tracer         -- tracing.Tracer instance receiving simulation events
+                          (a no-op tracer unless replaced with set_tracer)
+        rng            -- random.Random instance used for all random choices
+                          made by the building (seeded with seed)
+        traffic rng    -- random.Random instance reserved for the traffic
+                          source, so that traffic does not depend on the
+                          choices made by the building
+        id gen         -- generator of unique ids for calls generated by the
+                          building
         """
-        self.env = simpy.Environment()
+        self.env = env if env is not None else simpy.Environment()
+        self.name = name
+        self.tracer = NullTracer()
+        self.rng = random.Random(seed)
+        self.traffic_rng = random.Random(None if seed is None
+                                         else f"traffic-{seed}")
+        self.id_gen = call_id_generator()
         self.call_generator = self.env.process(self._generate_calls())
         self.call_assigner = self.env.process(self._assign_calls())
-        self.call_queue = simpy.Store(self.env)
-        self.call_history = []
+        self.call_queue = new_store(self.env)
+        if columnar:
+            self.call_history = CallStore()
+            self.keep_history = False
+            self.call_factory = self.call_history.new_call
+        else:
+            self.call_history = []
+            self.keep_history = keep_history
+            self.call_factory = Call
+        self.metrics = CallMetrics()
+        self.traffic = traffic
+        self._arrivals = None
+        self._next_arrival = None
+        self._wait = None
         self.num_floors = num_floors
         self.num_elevators = num_elevators
+        self.capacity = capacity
+        self.parking = parking
         self.elevators = self._init_elevators(num_elevators)
         self.service_ranges = self._init_service_ranges()
 
+    def set_tracer(self, tracer):
+        """Route events of the building and its elevators to tracer."""
+        self.tracer = tracer
+        for elevator in self.elevators:
+            elevator.tracer = tracer
+
+    def _register_call(self, call):
+        """Track a newly generated call in the metrics and call history."""
+        call.observer = self.metrics
+        self.metrics.on_generated(call)
+        if self.parking is not None:
+            self.parking.observe(call)
+        if self.keep_history:
+            self.call_history.append(call)
+
+    def __getstate__(self):
+        """Return the state to pickle, without simulation objects."""
+        return detached_state(self)
+
+    def _waits(self):
+        """Return a dictionary mapping the pending timeout of each process
+        to a name identifying the process (see snapshots).
+        """
+        waits = {self._wait: "generator"}
+        for elevator in self.elevators:
+            waits[elevator._wait] = ("elevator", elevator.id)
+        return waits
+
+    def _resume(self, env, resumes):
+        """Attach the building, restored from a snapshot, to env and restart
+        its processes.
+
+        resumes -- list of (process name, wake time) of the processes that
+                   were waiting on a timeout, in the order the timeouts were
+                   due
+        """
+        self.env = env
+        self.tracer = NullTracer()
+        self.call_queue = attached_store(env, self.call_queue)
+        for elevator in self.elevators:
+            elevator.env = env
+            elevator.tracer = self.tracer
+            elevator.call_pipe = attached_store(env, elevator.call_pipe)
+        for name, wake in resumes:
+            self._resume_process(name, wake)
+        resumed = {name for name, _ in resumes}
+        if "assigner" not in resumed:
+            self._resume_process("assigner", None)
+        for elevator in self.elevators:
+            if ("elevator", elevator.id) not in resumed:
+                # Idle, waiting for a call rather than a timeout
+                elevator._resume_handling(None)
+        for elevator in self.elevators:
+            elevator.call_awaiter = env.process(elevator._await_calls())
+
+    def _resume_process(self, name, wake):
+        """Restart the process with given name, waiting until wake."""
+        if name == "generator":
+            self.call_generator = self.env.process(self._generate_calls(wake))
+        elif name == "assigner":
+            self.call_assigner = self.env.process(self._assign_calls())
+        else:
+            _, elevator_id = name
+            self.elevators[elevator_id]._resume_handling(wake)
+
+    def _generate_calls_from(self, arrivals, pending=None):
+        """Generate calls from an iterator of (time, source, dest) tuples.
+
+        Each call is generated exactly at its time. Arrivals must be in
+        chronological order and lie within the building's floors.
+
+        pending -- arrival already drawn from arrivals but not generated yet,
+                   generated first (when restarted from a snapshot)
+        """
+        if pending is not None:
+            arrivals = itertools.chain([pending], arrivals)
+        for arrival in arrivals:
+            time, source, dest = arrival
+            if time < self.env.now:
+                raise TrafficError("Arrivals are not in chronological order.")
+            if not (1 <= source <= self.num_floors
+                    and 1 <= dest <= self.num_floors):
+                raise TrafficError(f"Arrival at time {time} from floor "
+                                   f"{source} to {dest} is out of range.")
+            if time > self.env.now:
+                self._next_arrival = arrival
+                self._wait = self.env.timeout(time - self.env.now)
+                yield self._wait
+            call = self.call_factory(source, dest, time, next(self.id_gen))
+            if self.tracer.level <= INFO:
+                self.tracer.emit(self.env.now, INFO, "generate", call=call.id,
+                                 source=call.source, dest=call.dest)
+            self._register_call(call)
+            self.call_queue.put(call)
+
     def _init_elevators(self, num_elevators):
         """Create specified number of elevators and return them as a list."""
         elevators = []
         for i in range(num_elevators):
-            elevators.append(Elevator(self, self.env, i))
+            elevators.append(Elevator(self, self.env, i, self.capacity,
+                                      call_manager_cls=self.call_manager_cls))
+            if self.parking is not None:
+                elevators[i].park = self._parking_floor
         return elevators
 
+    def _parking_floor(self, elevator):
+        """Return the floor the parking policy sends idle elevator to,
+        within its service range (None to stay)."""
+        floor = self.parking.parking_floor(self, elevator)
+        if floor is None:
+            return None
+        return min(max(floor, elevator.lower_bound), elevator.upper_bound)
+
     def _init_service_ranges(self):
         """Set service range for each elevator."""
         ranges = {}
@@ -50,8 +225,11 @@ class Building(ABC):
         return ranges
 
     @abstractmethod
-    def _generate_calls(self):
-        """Periodically generate a call and place it into the call queue."""
+    def _generate_calls(self, wake=None):
+        """Periodically generate a call and place it into the call queue.
+
+        wake -- time the next call is due (when restarted from a snapshot)
+        """
         pass
 
     @abstractmethod
@@ -73,24 +251,38 @@ class Building(ABC):
 class BasicBuilding(Building):
     """A building that assigns calls randomly."""
 
-    def _generate_calls(self):
-        print_status(self.env.now, f"Building has started generating calls...")
+    def _generate_calls(self, wake=None):
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "generate_start")
+        if self.traffic is not None:
+            if self._arrivals is None:
+                self._arrivals = self.traffic.arrivals(self)
+            yield from self._generate_calls_from(self._arrivals,
+                                                 self._next_arrival)
+            return
+        delay = 100 if wake is None else wake - self.env.now
         while True:
-            yield self.env.timeout(100)
+            self._wait = self.env.timeout(delay)
+            yield self._wait
+            delay = 100
             call = self._generate_single_call()
+            self._register_call(call)
             self.call_queue.put(call)
-            self.call_history.append(call)
 
     def _generate_single_call(self):
         """Return a single, random call."""
-        call = rand_call(self.env.now, self.num_floors)
-        print_status(self.env.now, f"[Generate] call {call.id}:"
-                                   f" floor {call.source} to {call.dest}")
+        call = rand_call(self.env.now, self.num_floors, rng=self.rng,
+                         call_id=next(self.id_gen),
+                         factory=self.call_factory)
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "generate", call=call.id,
+                             source=call.source, dest=call.dest)
         return call
 
     def _assign_calls(self):
         """Periodically check the call queue for any calls and assign them."""
-        print_status(self.env.now, "Building has started assigning calls...")
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "assign_start")
         while True:
             call = yield self.call_queue.get()
             elevator = self._select_elevator(call)
@@ -98,19 +290,552 @@ class BasicBuilding(Building):
 
     def _select_elevator(self, call):
         """Select an elevator at random to handle the given call."""
-        selected = self.elevators[randint(0, self.num_elevators - 1)]
-        print_status(self.env.now,
-                     f"[Select] call {call.id}: Elevator {selected.id}")
+        selected = self.elevators[self.rng.randint(0, self.num_elevators - 1)]
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "select", call=call.id,
+                             elevator=selected.id)
+        return selected
+
+
+class EstimatedTimeOfArrivalBuilding(BasicBuilding):
+    """A building that assigns each call to the elevator that arrives first.
+
+    Every elevator that can serve the call is scored with an estimate of
+    the time it needs to reach the call's floor when following SCAN from
+    its current position and direction: travel time to the end of its
+    current sweep (and back, if the call lies behind it or heads the other
+    way), plus a fixed time for every stop it makes on the way. Cars
+    carrying passengers are slightly penalized, so ties go to the emptier
+    car, and full cars are avoided.
+
+    The sorted stop floors of each elevator are derived from its call
+    manager only when the manager's version, the elevator's direction or its
+    floor change, so scoring a call costs O(log n) per elevator.
+
+    load weight  -- cost (in time*) added per passenger on board
+    full penalty -- cost (in time*) added if the car is at maximum capacity
+
+    (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+    """
+    load_weight = 10
+    full_penalty = 3000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._routes = {}
+
+    def _select_elevator(self, call):
+        """Select the elevator with the lowest estimated time of arrival."""
+        selected = None
+        lowest_cost = None
+        for elevator in self._candidates(call):
+            cost = self._cost(elevator, call)
+            if lowest_cost is None or cost < lowest_cost:
+                selected = elevator
+                lowest_cost = cost
+        if selected is None:
+            raise DispatchError(f"No elevator can serve call {call.id}.")
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "select", call=call.id,
+                             elevator=selected.id)
+        return selected
+
+    def _candidates(self, call):
+        """Return the elevators that may be assigned the given call."""
+        return [elevator for elevator in self.elevators
+                if _serves(elevator, call)]
+
+    def _route(self, elevator):
+        """Return the stop floors of elevator's planned route.
+
+        Return a tuple (ahead, behind, unreachable) of sorted floor lists:
+        stops of the current sweep, pickups of the reverse sweep and pickups
+        left for the sweep after that. Cached until the elevator changes.
+        """
+        call_queue = elevator.call_queue
+        key = (call_queue.version, elevator.direction, elevator.floor)
+        cached = self._routes.get(elevator.id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        direction = elevator.direction
+        ahead = set(call_queue.get_reachable_pickups(direction))
+        ahead.update(call_queue.get_all_dropoffs())
+        route = (sorted(ahead),
+                 sorted(call_queue.get_reachable_pickups(-direction)),
+                 sorted(call_queue.get_unreachable_pickups(direction)))
+        self._routes[elevator.id] = (key, route)
+        return route
+
+    def _cost(self, elevator, call):
+        """Return the estimated cost for elevator to serve call."""
+        ahead, behind, unreachable = self._route(elevator)
+        position = elevator.position()
+        direction = elevator.direction
+        source = call.source
+        if not ahead and not behind and not unreachable:
+            distance = abs(source - position)
+            stops = 0
+        elif (call.direction == direction
+                and (source - position) * direction >= 0):
+            # On the way in the current sweep
+            distance = abs(source - position)
+            stops = _count_between(ahead, position, source)
+        else:
+            sweep_end = _sweep_end(ahead, position, direction)
+            distance = abs(sweep_end - position)
+            stops = len(ahead)
+            if call.direction != direction:
+                # Picked up in the reverse sweep
+                distance += abs(sweep_end - source)
+                stops += _count_between(behind, sweep_end, source)
+            else:
+                # Picked up once the car has reversed twice
+                reverse_end = _sweep_end(behind + [source], sweep_end,
+                                         -direction)
+                distance += abs(sweep_end - reverse_end)
+                distance += abs(reverse_end - source)
+                stops += len(behind)
+                stops += _count_between(unreachable, reverse_end, source)
+        stops += len(elevator.call_pipe.items)
+        stop_time = (elevator.door_open_time + elevator.door_close_time
+                     + elevator.pickup_duration + elevator.dropoff_duration)
+        cost = (distance * elevator.f2f_time + stops * stop_time
+                + self.load_weight * elevator.curr_capacity)
+        if elevator.curr_capacity >= elevator.max_capacity:
+            cost += self.full_penalty
+        return cost
+
+
+class DestinationDispatchBuilding(EstimatedTimeOfArrivalBuilding):
+    """A building that groups passengers by destination (destination
+    dispatch).
+
+    Passengers enter their destination at the landing, so the destination
+    of every call is known when it is assigned. Calls are collected over a
+    short decision window, sorted by origin and destination, and assigned
+    one after another to the elevator with the lowest cost: its estimated
+    time of arrival (see EstimatedTimeOfArrivalBuilding), plus a penalty if
+    the call's destination is not yet a stop of the elevator for passengers
+    heading the same way. Passengers travelling to the same floor thus tend
+    to share a car, which makes fewer stops per round trip.
+
+    decision window -- time* calls are collected for before being assigned
+    stop penalty    -- cost (in time*) of adding a destination stop to an
+                       elevator
+
+    (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+    """
+    decision_window = 20
+    stop_penalty = 300
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._batch = []
+        self._window = None
+        self._destination_floors = {}
+
+    def _assign_calls(self, wake=None):
+        """Collect calls over the decision window, then assign them grouped
+        by origin and destination.
+
+        wake -- end of the decision window in progress (when restarted from
+                a snapshot)
+        """
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "assign_start")
+        while True:
+            if wake is None:
+                call = yield self.call_queue.get()
+                self._batch = [call]
+                delay = self.decision_window
+            else:
+                delay = wake - self.env.now
+                wake = None
+            self._window = self.env.timeout(delay)
+            yield self._window
+            # Nothing else gets from the call queue, so calls received
+            # during the window can be taken from it directly
+            batch = self._batch + self.call_queue.items
+            self.call_queue.items.clear()
+            self._batch = []
+            batch.sort(key=lambda call: (call.source, call.dest))
+            for call in batch:
+                elevator = self._select_elevator(call)
+                elevator.enqueue(call)
+
+    def _cost(self, elevator, call):
+        """Return the estimated cost for elevator to serve call, including
+        the stop it adds at the call's destination."""
+        cost = super()._cost(elevator, call)
+        if call.dest not in self._destinations(elevator, call.direction):
+            cost += self.stop_penalty
+        return cost
+
+    def _destinations(self, elevator, direction):
+        """Return the floors elevator will let off passengers heading in
+        direction at.
+
+        Floors derived from the call manager are cached until it changes.
+        """
+        call_queue = elevator.call_queue
+        key = (call_queue.version, elevator.direction)
+        cached = self._destination_floors.get((elevator.id, direction))
+        if cached is not None and cached[0] == key:
+            floors = cached[1]
+        else:
+            floors = set()
+            for pickups in (call_queue.get_reachable_pickups(direction),
+                            call_queue.get_unreachable_pickups(direction)):
+                for calls in pickups.values():
+                    floors.update(call.dest for call in calls)
+            if direction == elevator.direction:
+                floors.update(call_queue.get_all_dropoffs())
+            self._destination_floors[(elevator.id, direction)] = (key, floors)
+        assigned = [call.dest for call in elevator.call_pipe.items
+                    if call.direction == direction]
+        if assigned:
+            return floors.union(assigned)
+        return floors
+
+    def _waits(self):
+        """Return pending timeouts of all processes, with the assigner's."""
+        waits = super()._waits()
+        waits[self._window] = "assigner"
+        return waits
+
+    def _resume_process(self, name, wake):
+        """Restart the process with given name, waiting until wake."""
+        if name == "assigner" and wake is not None:
+            self.call_assigner = self.env.process(self._assign_calls(wake))
+        else:
+            super()._resume_process(name, wake)
+
+
+def _serves(elevator, call):
+    """Return True if call's floors lie in elevator's service range."""
+    return (elevator.lower_bound <= call.source <= elevator.upper_bound
+            and elevator.lower_bound <= call.dest <= elevator.upper_bound)
+
+
+def _count_between(floors, start, end):
+    """Return the number of sorted floors strictly between start and end."""
+    low, high = min(start, end), max(start, end)
+    return max(0, bisect.bisect_left(floors, high)
+               - bisect.bisect_right(floors, low))
+
+
+def _sweep_end(floors, position, direction):
+    """Return the last floor reached sweeping from position in direction."""
+    if not floors:
+        return position
+    if direction == UP:
+        return max(floors[-1], position)
+    return min(floors[0], position)
+
+
+class BasicSectorBuilding(EstimatedTimeOfArrivalBuilding):
+    """A building whose upper floors are divided into sectors (zones).
+
+    Floors above the lobby are split into num_sectors contiguous sectors,
+    and every elevator is dedicated to one sector: its service range runs
+    from the lobby to the top of its sector. A call is assigned to an
+    elevator of the sector containing its non-lobby floor (the destination
+    of calls from the lobby, the source otherwise), choosing among them by
+    estimated time of arrival. Calls that no elevator of that sector can
+    serve go to any elevator that can.
+
+    Sectors hold equal numbers of floors.
+    """
+    lobby = 1
+
+    def __init__(self, num_floors, num_elevators, num_sectors=None,
+                 **kwargs):
+        """Create a sectored building.
+
+        num sectors -- number of sectors (one per elevator unless given, and
+                       at most one per elevator and per floor above the
+                       lobby)
+
+        Other arguments are as for Building.
+
+        sectors            -- list of (lowest floor, highest floor) of each
+                              sector
+        sector of elevator -- list mapping elevator id to its sector index
+        """
+        if num_sectors is None:
+            num_sectors = num_elevators
+        if not 1 <= num_sectors <= min(num_elevators, num_floors - 1):
+            raise ServiceRangeError("Invalid number of sectors.")
+        self.num_sectors = num_sectors
+        self.sector_of_elevator = [i * num_sectors // num_elevators
+                                   for i in range(num_elevators)]
+        self.sectors = _partition(range(self.lobby + 1, num_floors + 1),
+                                  [1] * (num_floors - self.lobby),
+                                  num_sectors)
+        super().__init__(num_floors, num_elevators, **kwargs)
+
+    def _init_service_ranges(self):
+        """Set each elevator's range from the lobby to its sector's top."""
+        ranges = {}
+        for elevator in self.elevators:
+            _, upper_bound = self.sectors[self.sector_of_elevator[elevator.id]]
+            ranges[elevator] = (self.lobby, upper_bound)
+            elevator.set_service_range(self.lobby, upper_bound)
+        return ranges
+
+    def _sector_of(self, floor):
+        """Return the index of the sector containing floor."""
+        for i, (_, upper_bound) in enumerate(self.sectors):
+            if floor <= upper_bound:
+                return i
+        return len(self.sectors) - 1
+
+    def _candidates(self, call):
+        """Return elevators of the call's sector, or any that can serve it."""
+        floor = call.dest if call.source == self.lobby else call.source
+        sector = self._sector_of(floor)
+        candidates = [elevator for elevator in self.elevators
+                      if self.sector_of_elevator[elevator.id] == sector
+                      and _serves(elevator, call)]
+        return candidates or super()._candidates(call)
+
+
+class DynamicLoadBalancingBuilding(BasicSectorBuilding):
+    """A sectored building that periodically re-partitions its sectors.
+
+    The building counts, for every floor above the lobby, the calls that
+    start or end there. Every rebalance interval, sectors are re-drawn so
+    that they carry equal shares of the counted demand, and counts are
+    decayed so that recent demand weighs the most.
+
+    An elevator's service range is narrowed to its new sector only once it
+    has no calls beyond it; until then it keeps serving up to its farthest
+    committed floor.
+    """
+
+    def __init__(self, num_floors, num_elevators, num_sectors=None,
+                 rebalance_interval=3000, decay=0.5, **kwargs):
+        """Create a dynamically sectored building.
+
+        rebalance interval -- time* between re-partitions
+        decay              -- factor applied to demand counts after every
+                              re-partition (0 forgets all past demand, 1
+                              keeps it all)
+
+        Other arguments are as for BasicSectorBuilding.
+
+        floor demand -- dictionary mapping floor above the lobby to its
+                        (decayed) count of calls
+        assigned     -- list mapping elevator id to the calls assigned to it
+                        that were not completed at the last re-partition
+
+        (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+        """
+        self.rebalance_interval = rebalance_interval
+        self.decay = decay
+        self.floor_demand = {floor: 0.0
+                             for floor in range(self.lobby + 1,
+                                                num_floors + 1)}
+        super().__init__(num_floors, num_elevators, num_sectors, **kwargs)
+        self.assigned = [[] for _ in range(num_elevators)]
+        self._rebalance_wait = None
+        self.rebalancer = self.env.process(self._rebalance())
+
+    def _register_call(self, call):
+        """Track a newly generated call, counting it towards floor demand."""
+        super()._register_call(call)
+        for floor in (call.source, call.dest):
+            if floor != self.lobby:
+                self.floor_demand[floor] += 1
+
+    def _select_elevator(self, call):
+        """Select an elevator as in BasicSectorBuilding and remember it."""
+        selected = super()._select_elevator(call)
+        self.assigned[selected.id].append(call)
         return selected
 
+    def _waits(self):
+        """Return pending timeouts of all processes, with the rebalancer's."""
+        waits = super()._waits()
+        waits[self._rebalance_wait] = "rebalancer"
+        return waits
+
+    def _resume_process(self, name, wake):
+        """Restart the process with given name, waiting until wake."""
+        if name == "rebalancer":
+            self.rebalancer = self.env.process(self._rebalance(wake))
+        else:
+            super()._resume_process(name, wake)
 
-class BasicSectorBuilding:
-    pass
+    def _rebalance(self, wake=None):
+        """Periodically re-partition sectors according to floor demand.
+
+        wake -- time of the next re-partition (when restarted from a
+                snapshot)
+        """
+        delay = self.rebalance_interval
+        if wake is not None:
+            delay = wake - self.env.now
+        while True:
+            self._rebalance_wait = self.env.timeout(delay)
+            yield self._rebalance_wait
+            delay = self.rebalance_interval
+            floors = sorted(self.floor_demand)
+            # A small base weight keeps floors without demand in some sector
+            weights = [self.floor_demand[floor] + 0.01 for floor in floors]
+            self.sectors = _partition(floors, weights, self.num_sectors)
+            for floor in floors:
+                self.floor_demand[floor] *= self.decay
+            self._update_service_ranges()
+            if self.tracer.level <= INFO:
+                self.tracer.emit(self.env.now, INFO, "rebalance",
+                                 sectors=self.sectors)
 
+    def _update_service_ranges(self):
+        """Move each elevator's range towards its current sector."""
+        for elevator in self.elevators:
+            _, upper_bound = self.sectors[self.sector_of_elevator[elevator.id]]
+            upper_bound = max(upper_bound, self._farthest_commitment(elevator))
+            self.service_ranges[elevator] = (self.lobby, upper_bound)
+            elevator.set_service_range(self.lobby, upper_bound)
 
-class DynamicLoadBalancingBuilding:
-    pass
+    def _farthest_commitment(self, elevator):
+        """Return the highest floor elevator is committed to visit.
+
+        Completed calls are forgotten along the way.
+        """
+        pending = [call for call in self.assigned[elevator.id]
+                   if not call.done]
+        self.assigned[elevator.id] = pending
+        floors = [elevator.floor]
+        for call in pending:
+            floors.append(call.source)
+            floors.append(call.dest)
+        return max(floors)
+
+
+def _partition(floors, weights, num_parts):
+    """Split floors into contiguous parts of about equal total weight.
+
+    floors  -- sorted floors to split
+    weights -- weight of each floor
+    Return a list of (lowest floor, highest floor) of each part. Every part
+    holds at least one floor.
+    """
+    floors = list(floors)
+    total = sum(weights)
+    parts = []
+    start = 0
+    cumulative = 0
+    for i, weight in enumerate(weights):
+        cumulative += weight
+        remaining_parts = num_parts - len(parts) - 1
+        remaining_floors = len(floors) - i - 1
+        target = total * (len(parts) + 1) / num_parts
+        if remaining_parts and (cumulative >= target
+                                or remaining_floors == remaining_parts):
+            parts.append((floors[start], floors[i]))
+            start = i + 1
+    parts.append((floors[start], floors[-1]))
+    return parts
+
+
+class DeepReinforcementLearningBuilding(BasicBuilding):
+    """A building whose call assignments are decided from outside.
+
+    Every call to be assigned is an action to take: either a policy given
+    to the building chooses the elevator, or the call assigner suspends
+    until decide() is invoked, as done by environments.DispatchEnvironment
+    for reinforcement learning agents.
+    """
+
+    def __init__(self, num_floors, num_elevators, policy=None, **kwargs):
+        """Create a building with externally decided assignments.
+
+        policy -- callable taking the building and a call, and returning the
+                  index of the elevator to assign it to (if not given, the
+                  assigner waits for decide())
+
+        Other arguments are as for Building.
+
+        pending call -- call awaiting a decision, or None
+        decision     -- simpy event succeeded with the chosen elevator index
+        """
+        super().__init__(num_floors, num_elevators, **kwargs)
+        self.policy = policy
+        self.pending_call = None
+        self.decision = None
+
+    def _assign_calls(self, pending=None):
+        """Assign each call once an elevator has been chosen for it.
+
+        pending -- call awaiting a decision, to be assigned first (when
+                   restarted from a snapshot)
+        """
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "assign_start")
+        if pending is not None:
+            action = yield self.decision
+            self._elevator_for(pending, action).enqueue(pending)
+        while True:
+            call = yield self.call_queue.get()
+            if self.policy is not None:
+                elevator = self._select_elevator(call)
+            else:
+                self.pending_call = call
+                self.decision = self.env.event()
+                action = yield self.decision
+                elevator = self._elevator_for(call, action)
+            elevator.enqueue(call)
+
+    def _resume_process(self, name, wake):
+        """Restart the process with given name, waiting until wake.
+
+        An assigner that was awaiting a decision awaits it anew.
+        """
+        if name == "assigner" and self.pending_call is not None:
+            self.decision = self.env.event()
+            self.call_assigner = self.env.process(
+                self._assign_calls(self.pending_call))
+        else:
+            super()._resume_process(name, wake)
+
+    def decide(self, action):
+        """Assign the pending call to the elevator with index action.
+
+        An invalid action raises DispatchError and leaves the call pending.
+        """
+        if self.pending_call is None:
+            raise DispatchError("No call is awaiting a decision.")
+        self._check_action(self.pending_call, action)
+        self.pending_call = None
+        self.decision.succeed(action)
+
+    def _select_elevator(self, call):
+        """Select the elevator chosen by the building's policy."""
+        return self._elevator_for(call, self.policy(self, call))
+
+    def _check_action(self, call, action):
+        """Raise DispatchError unless the elevator with index action can
+        serve call."""
+        if not 0 <= action < self.num_elevators:
+            raise DispatchError(f"No elevator with index {action}.")
+        if not _serves(self.elevators[action], call):
+            raise DispatchError(f"Elevator {action} cannot serve call "
+                                f"{call.id}.")
+
+    def _elevator_for(self, call, action):
+        """Return the elevator with index action, checking it can serve call."""
+        self._check_action(call, action)
+        selected = self.elevators[action]
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "select", call=call.id,
+                             elevator=selected.id)
+        return selected
 
 
-class DeepReinforcementLearningBuilding:
-    pass
+# -- Custom Errors --
+class DispatchError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,252 @@
+"""Columnar storage of calls for bulk workloads.
+
+A CallStore keeps every call it creates in parallel typed arrays (one per
+attribute) instead of one Python object per call, and hands out StoredCall
+views that behave like utils.Call while reading and writing the columns.
+Views are only alive while a call is being handled, so a long simulation
+costs a few dozen bytes per call.
+
+Columns can be reduced directly, without materializing calls. If NumPy is
+installed, as_numpy() exposes the columns as arrays without copying.
+"""
+
+
+from array import array
+import math
+
+from elevator_playground.utils import UP, DOWN
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+NAN = math.nan
+
+
+class CallStore:
+    """Parallel columns holding the attributes of many calls.
+
+    Columns (one entry per call, in order of creation):
+    id              -- unique number to identify a call
+    source          -- floor that requires pick-up
+    dest            -- floor that requires drop-off
+    orig time       -- time* that the call was initialized
+    pickup time     -- time* that the call was picked up (NaN if not yet)
+    completion time -- time* that the call was completed (NaN if not yet)
+    elevator id     -- id of the elevator the call was assigned to (-1 if
+                       not yet assigned)
+
+    (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+    """
+    COLUMNS = ("id", "source", "dest", "orig_time", "pickup_time",
+               "completion_time", "elevator_id")
+
+    def __init__(self):
+        """Create an empty store.
+
+        observer -- object notified when any call of the store is picked up
+                    and completed (e.g. metrics.CallMetrics), or None
+        """
+        self.id = array("q")
+        self.source = array("l")
+        self.dest = array("l")
+        self.orig_time = array("d")
+        self.pickup_time = array("d")
+        self.completion_time = array("d")
+        self.elevator_id = array("l")
+        self.observer = None
+
+    def new_call(self, source, destination, time, call_id=None):
+        """Append a new call and return a view of it.
+
+        Takes the same arguments as utils.Call. If call_id is not given, the
+        call is numbered by its position in the store (starting from 1).
+        """
+        if source == destination:
+            raise Exception("A call was generated with the same source and "
+                            "destination.")
+        index = len(self.id)
+        self.id.append(call_id if call_id is not None else index + 1)
+        self.source.append(source)
+        self.dest.append(destination)
+        self.orig_time.append(time)
+        self.pickup_time.append(NAN)
+        self.completion_time.append(NAN)
+        self.elevator_id.append(-1)
+        return StoredCall(self, index)
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, index):
+        """Return a view of the call at given position."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Call index out of range.")
+        return StoredCall(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield StoredCall(self, index)
+
+    def column(self, name):
+        """Return the column with given name (one of COLUMNS)."""
+        if name not in self.COLUMNS:
+            raise KeyError(f"No column named '{name}'.")
+        return getattr(self, name)
+
+    def as_numpy(self):
+        """Return a dictionary mapping column name to a NumPy array.
+
+        Arrays share memory with the columns, so they must not be kept while
+        calls are being added. Requires NumPy.
+        """
+        if numpy is None:
+            raise ImportError("CallStore.as_numpy() requires NumPy.")
+        return {name: numpy.frombuffer(getattr(self, name),
+                                       dtype=getattr(self, name).typecode)
+                for name in self.COLUMNS}
+
+    def wait_times(self):
+        """Return wait times of completed calls as an array."""
+        return array("d", (p - o for o, p, c in zip(self.orig_time,
+                                                     self.pickup_time,
+                                                     self.completion_time)
+                           if c == c))
+
+    def process_times(self):
+        """Return process times of completed calls as an array."""
+        return array("d", (c - o for o, c in zip(self.orig_time,
+                                                  self.completion_time)
+                           if c == c))
+
+    def summary(self):
+        """Return metrics of completed calls, computed from the columns.
+
+        Keys match metrics.CallMetrics.summary(), with exact rather than
+        estimated percentiles. Times are in simulation time units.
+        """
+        results = {"generated": len(self)}
+        if numpy is not None:
+            columns = self.as_numpy()
+            done = ~numpy.isnan(columns["completion_time"])
+            series = (
+                ("wait", (columns["pickup_time"]
+                          - columns["orig_time"])[done]),
+                ("process", (columns["completion_time"]
+                             - columns["orig_time"])[done]),
+            )
+            results["completed"] = int(done.sum())
+            for name, values in series:
+                if not len(values):
+                    results[f"avg_{name}"] = None
+                    results[f"max_{name}"] = None
+                    for q in (50, 95, 99):
+                        results[f"p{q}_{name}"] = None
+                    continue
+                results[f"avg_{name}"] = float(values.mean())
+                results[f"max_{name}"] = float(values.max())
+                for q in (50, 95, 99):
+                    results[f"p{q}_{name}"] = float(
+                        numpy.percentile(values, q, method="lower"))
+            return results
+        series = (("wait", sorted(self.wait_times())),
+                  ("process", sorted(self.process_times())))
+        results["completed"] = len(series[0][1])
+        for name, values in series:
+            if not values:
+                results[f"avg_{name}"] = None
+                results[f"max_{name}"] = None
+                for q in (50, 95, 99):
+                    results[f"p{q}_{name}"] = None
+                continue
+            results[f"avg_{name}"] = math.fsum(values) / len(values)
+            results[f"max_{name}"] = values[-1]
+            for q in (50, 95, 99):
+                results[f"p{q}_{name}"] = values[q * (len(values) - 1) // 100]
+        return results
+
+
+class StoredCall:
+    """A view of a single call held in a CallStore.
+
+    Offers the same attributes and methods as utils.Call, backed by the
+    store's columns.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self):
+        return self._store.id[self._index]
+
+    @property
+    def source(self):
+        return self._store.source[self._index]
+
+    @property
+    def dest(self):
+        return self._store.dest[self._index]
+
+    @property
+    def direction(self):
+        return UP if self.dest > self.source else DOWN
+
+    @property
+    def orig_time(self):
+        return self._store.orig_time[self._index]
+
+    @property
+    def wait_time(self):
+        pickup_time = self._store.pickup_time[self._index]
+        if pickup_time != pickup_time:
+            return None
+        return pickup_time - self.orig_time
+
+    @property
+    def process_time(self):
+        completion_time = self._store.completion_time[self._index]
+        if completion_time != completion_time:
+            return None
+        return completion_time - self.orig_time
+
+    @property
+    def done(self):
+        completion_time = self._store.completion_time[self._index]
+        return completion_time == completion_time
+
+    @property
+    def elevator_id(self):
+        elevator_id = self._store.elevator_id[self._index]
+        return None if elevator_id < 0 else elevator_id
+
+    @elevator_id.setter
+    def elevator_id(self, elevator_id):
+        self._store.elevator_id[self._index] = elevator_id
+
+    @property
+    def observer(self):
+        """Observer of the store (shared by all of its calls)."""
+        return self._store.observer
+
+    @observer.setter
+    def observer(self, observer):
+        self._store.observer = observer
+
+    def picked_up(self, pick_up_time):
+        """Record when the call was picked up."""
+        self._store.pickup_time[self._index] = pick_up_time
+        if self._store.observer is not None:
+            self._store.observer.on_pickup(self)
+
+    def completed(self, completion_time):
+        """Record when the call was completed."""
+        self._store.completion_time[self._index] = completion_time
+        if self._store.observer is not None:
+            self._store.observer.on_completion(self)
@@ -0,0 +1,247 @@
+"""Adaptive run length: warm-up detection and stopping on convergence.
+
+A session given an AdaptiveRunLength (Session(building, max_runtime,
+adaptive=AdaptiveRunLength(precision=0.05))) runs in batches of simulation
+time rather than for a fixed runtime, which becomes a maximum. After every
+batch, the wait times of the calls completed in each batch so far are
+averaged (batch means), and:
+- the warm-up period, during which elevators start from rest and empty
+  queues fill up, is detected with the MSER rule (see mser()) and its
+  batches are discarded
+- the steady-state average wait time is estimated by the mean of the
+  remaining batch means, with a Student t confidence interval, and the
+  session stops as soon as the half width of the interval is within
+  precision of the estimate
+
+Once max batches have been recorded, consecutive batches are merged
+pairwise and the batch length doubles, so that memory use does not grow
+with the length of the run.
+"""
+
+
+from elevator_playground.intervals import confidence_interval
+from elevator_playground.metrics import ChainedObserver
+
+
+# Keys of the steady-state results (see AdaptiveRunLength.summary)
+SUMMARY_KEYS = ("warmup", "simulated", "batches", "converged",
+                "steady_completed", "steady_avg_wait", "steady_avg_wait_hw",
+                "steady_max_wait", "steady_avg_process", "steady_max_process")
+
+
+# -- Fields of a batch --
+COMPLETED = 0
+WAIT_SUM = 1
+WAIT_MAX = 2
+PROCESS_SUM = 3
+PROCESS_MAX = 4
+# ----
+
+
+class AdaptiveRunLength:
+    """Batch statistics of a session's calls, deciding when it may stop.
+
+    The session attaches the rule when it starts running, ends a batch every
+    batch length of simulation time until the rule has converged (or the
+    runtime is over), and detaches it when it is done.
+    """
+    def __init__(self, precision=0.05, confidence=0.95, batch_length=3000,
+                 min_batches=10, max_batches=100):
+        """Create a rule.
+
+        precision    -- target half width of the confidence interval of the
+                        average wait time, relative to the average
+        confidence   -- confidence level of the interval (see
+                        intervals.T_TABLE)
+        batch length -- initial simulation time* of a batch
+        min batches  -- number of batches (with completed calls) needed
+                        before an estimate is made
+        max batches  -- number of batches at which pairs of batches are
+                        merged (even, at least twice min batches)
+
+        Attributes:
+        batches         -- list of batches, each a list of the number of
+                           calls completed in it, and the sum and maximum of
+                           their wait and process times
+        warmup batches  -- number of batches discarded as warm-up, or None
+                           before an estimate is made
+        estimate        -- estimate of the average wait time (see
+                           intervals.confidence_interval), or None
+        converged       -- whether the estimate reached the precision
+
+        (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+        """
+        if precision <= 0:
+            raise ConvergenceError("Precision must be positive.")
+        if max_batches % 2 or max_batches < 2 * min_batches:
+            raise ConvergenceError("Max batches must be even and at least "
+                                   "twice min batches.")
+        self.precision = precision
+        self.confidence = confidence
+        self.batch_length = batch_length
+        self.min_batches = max(min_batches, 4)
+        self.max_batches = max_batches
+        self.batches = []
+        self.warmup_batches = None
+        self.estimate = None
+        self.converged = False
+        self._batch = _new_batch()
+        self._start = None
+        self._end = None
+        self._attached = []
+
+    def attach(self, buildings, now):
+        """Start recording the calls of buildings, in batches starting at
+        time now."""
+        if self._attached:
+            raise ConvergenceError("Rule is already attached.")
+        self._start = now
+        self._end = now
+        for building in buildings:
+            building.metrics.parent = _BatchRecorder(self,
+                                                     building.metrics.parent)
+            self._attached.append(building)
+
+    def detach(self):
+        """Stop recording calls."""
+        for building in self._attached:
+            building.metrics.parent = building.metrics.parent.parent
+        self._attached = []
+
+    def end_batch(self, now):
+        """Close the current batch at time now and update the estimate."""
+        self._end = now
+        self.batches.append(self._batch)
+        self._batch = _new_batch()
+        if len(self.batches) == self.max_batches:
+            self.batches = [_merged(self.batches[i], self.batches[i + 1])
+                            for i in range(0, len(self.batches), 2)]
+            self.batch_length *= 2
+        self._update()
+
+    def _update(self):
+        """Detect the warm-up and estimate the average wait time from the
+        batches after it."""
+        indices = [i for i, batch in enumerate(self.batches)
+                   if batch[COMPLETED]]
+        if len(indices) < self.min_batches:
+            return
+        waits = [self.batches[i][WAIT_SUM] / self.batches[i][COMPLETED]
+                 for i in indices]
+        discarded = mser(waits)
+        self.warmup_batches = indices[discarded]
+        self.estimate = confidence_interval(waits[discarded:],
+                                            self.confidence)
+        # A truncation point at the end of the searched range means the
+        # warm-up may not be over yet
+        self.converged = (discarded < len(waits) // 2
+                          and self.estimate["half_width"]
+                          <= self.precision * self.estimate["mean"])
+
+    def summary(self):
+        """Return the steady-state results as a flat dictionary.
+
+        warmup             -- simulation time at which warm-up ended
+        simulated          -- simulation time at the end of the last batch
+        batches            -- number of batches after warm-up
+        converged          -- whether the estimate reached the precision
+        steady completed   -- number of calls completed after warm-up
+        steady avg wait    -- estimated average wait time
+        steady avg wait hw -- half width of its confidence interval
+        steady max wait    -- maximum wait time after warm-up
+        steady avg process -- average process time (mean of batch means)
+        steady max process -- maximum process time after warm-up
+
+        Times are in simulation time units. Results but simulated are None
+        until an estimate is made.
+        """
+        results = dict.fromkeys(SUMMARY_KEYS)
+        results["simulated"] = self._end
+        if self.estimate is None:
+            return results
+        steady = [batch for batch in self.batches[self.warmup_batches:]
+                  if batch[COMPLETED]]
+        results.update(
+            warmup=self._start + self.warmup_batches * self.batch_length,
+            batches=len(steady),
+            converged=self.converged,
+            steady_completed=sum(batch[COMPLETED] for batch in steady),
+            steady_avg_wait=self.estimate["mean"],
+            steady_avg_wait_hw=self.estimate["half_width"],
+            steady_max_wait=max(batch[WAIT_MAX] for batch in steady),
+            steady_avg_process=(sum(batch[PROCESS_SUM] / batch[COMPLETED]
+                                    for batch in steady) / len(steady)),
+            steady_max_process=max(batch[PROCESS_MAX] for batch in steady),
+        )
+        return results
+
+
+class _BatchRecorder(ChainedObserver):
+    """Observer of a building's calls (see metrics.CallMetrics.parent)
+    adding completed calls to the current batch of a rule."""
+    def __init__(self, rule, parent):
+        super().__init__(parent)
+        self.rule = rule
+
+    def on_completion(self, call):
+        batch = self.rule._batch
+        batch[COMPLETED] += 1
+        batch[WAIT_SUM] += call.wait_time
+        batch[WAIT_MAX] = max(batch[WAIT_MAX], call.wait_time)
+        batch[PROCESS_SUM] += call.process_time
+        batch[PROCESS_MAX] = max(batch[PROCESS_MAX], call.process_time)
+        super().on_completion(call)
+
+
+def mser(values):
+    """Return the number of leading values to discard as warm-up.
+
+    By the MSER (marginal standard error) rule, this is the d, at most half
+    the number of values, minimizing
+
+        sum((x - mean) ** 2 for x in values[d:]) / len(values[d:]) ** 2
+
+    where mean is the mean of values[d:].
+
+    >>> mser([9, 7, 4, 2, 2, 3, 2, 2, 3, 2])
+    3
+    >>> mser([2, 3, 2, 2, 3, 2])
+    0
+    """
+    n = len(values)
+    total = 0.0
+    squares = 0.0
+    for x in values[n // 2:]:
+        total += x
+        squares += x * x
+    best, best_d = None, None
+    for d in range(n // 2, -1, -1):
+        if d < n // 2:
+            total += values[d]
+            squares += values[d] * values[d]
+        count = n - d
+        statistic = (squares - total * total / count) / (count * count)
+        if best is None or statistic <= best:
+            best, best_d = statistic, d
+    return best_d
+
+
+def _new_batch():
+    """Return an empty batch."""
+    return [0, 0.0, 0.0, 0.0, 0.0]
+
+
+def _merged(first, second):
+    """Return the batch made of two consecutive batches."""
+    return [first[COMPLETED] + second[COMPLETED],
+            first[WAIT_SUM] + second[WAIT_SUM],
+            max(first[WAIT_MAX], second[WAIT_MAX]),
+            first[PROCESS_SUM] + second[PROCESS_SUM],
+            max(first[PROCESS_MAX], second[PROCESS_MAX])]
+
+
+# -- Custom Errors --
+class ConvergenceError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -1,7 +1,10 @@
 from collections import deque
 
 import simpy
-from elevator_playground.utils import print_status, bitify, to_string, UP, DOWN
+from elevator_playground.kernel import new_store
+from elevator_playground.snapshots import detached_state
+from elevator_playground.tracing import INFO
+from elevator_playground.utils import bitify, to_string, UP, DOWN
 
 
 class Elevator:
@@ -13,7 +16,8 @@ class Elevator:
        as necessary.
     2) Once the elevator has serviced all calls in its current direction,
        reverse direction and go to step (1) if there are calls. Otherwise, stop
-       and wait for a call (or move to a "waiting floor")
+       and wait for a call (or, if the building has a parking policy, move to
+       a waiting floor once idle for a while)
 
     An Elevator maintains all un-handled calls in a call manager (an instance
     of the CallManager class, defined further below). The Elevator continuously
@@ -23,13 +27,18 @@ class Elevator:
     placed in the call pipe (a simple deque) to await further processing.
     """
 
-    def __init__(self, building, env, id_num, capacity=simpy.core.Infinity):
+    def __init__(self, building, env, id_num, capacity=simpy.core.Infinity,
+                 call_manager_cls=None):
         """
         Arguments:
-        building -- Building instance that contains this elevator
-        env      -- simpy.Environment instance that runs the simulation
-        id       -- unique ID (given by building) to identify each elevator
-        capacity -- total number of passengers that elevator can hold
+        building         -- Building instance that contains this elevator
+        env              -- simpy.Environment instance that runs the
+                            simulation
+        id               -- unique ID (given by building) to identify each
+                            elevator
+        capacity         -- total number of passengers that elevator can hold
+        call manager cls -- class maintaining unhandled calls (CallManager
+                            unless specified, see also BitsetCallManager)
 
         Attributes:
         call handler     -- simpy process for serving calls
@@ -37,7 +46,8 @@ class Elevator:
                             call pipe
         call queue       -- structure for maintaining unhandled calls
         call pipe        -- queue that holds assigned calls
-        floor            -- current floor
+        floor            -- current floor (while moving, the last floor
+                            passed; see also position())
         direction        -- current direction of service (1 denotes UP,
                             -1 denotes DOWN)
         curr capacity    -- current capacity
@@ -48,22 +58,46 @@ class Elevator:
         max capacity     -- maximum capacity
         pickup duration  -- time* it takes to pick up 1 passenger
         dropoff duration -- time* it takes to drop off 1 passenger
+        door open time   -- time* it takes to open the doors at a stop
+        door close time  -- time* it takes to close the doors at a stop
         f2f time         -- time* it takes to travel between adjacent floors
+        intercept        -- if True, shorten a trip in progress when a call
+                            that can be picked up on the way is received
+                            (off by default, which reproduces plain SCAN
+                            stop sequences)
+        park             -- callable taking the elevator and returning the
+                            floor to wait at when idle, or None to stay
+                            (set by buildings with a parking policy; never
+                            parks if None)
+        parking delay    -- time* an elevator stays idle before parking
+        tracer           -- tracing.Tracer instance receiving elevator events
+                            (shared with, and set by, the building)
 
         (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
         """
         self.env = env
         self.id = id_num
+        self.tracer = building.tracer
 
         # Call-processing utilities
         self.call_handler = self.env.process(self._handle_calls())
         self.call_awaiter = self.env.process(self._await_calls())
-        self.call_queue = CallManager(building.num_floors)
-        self.call_pipe = simpy.Store(env)
+        if call_manager_cls is None:
+            call_manager_cls = CallManager
+        self.call_queue = call_manager_cls(building.num_floors)
+        self.call_pipe = new_store(env)
 
         # Attributes that can change constantly
         self.floor = 1
         self.direction = UP
+        self._trip = None
+        self._trip_start = None
+        self._trip_step = None
+        self._trip_target = None
+        self._activity = None
+        self._wait = None
+        self._boarding = None
+        self._work = None
         self.curr_capacity = 0
         self.upper_bound = None
         self.lower_bound = None
@@ -72,7 +106,31 @@ class Elevator:
         self.max_capacity = capacity
         self.pickup_duration = 30
         self.dropoff_duration = 30
+        self.door_open_time = 20
+        self.door_close_time = 20
         self.f2f_time = 100
+        self.intercept = False
+        self.park = None
+        self.parking_delay = 300
+
+    @property
+    def floor(self):
+        """Return the current floor, or the last floor passed if moving."""
+        if self._trip_start is None:
+            return self._floor
+        passed = (self.env.now - self._trip_start) // self.f2f_time
+        return self._floor + self._trip_step * int(passed)
+
+    @floor.setter
+    def floor(self, floor):
+        self._floor = floor
+
+    def position(self):
+        """Return the exact, possibly fractional, position of the elevator."""
+        if self._trip_start is None:
+            return self._floor
+        elapsed = self.env.now - self._trip_start
+        return self._floor + self._trip_step * elapsed / self.f2f_time
 
     def set_service_range(self, lower, upper):
         """Set upper and lower bound of travel."""
@@ -81,24 +139,121 @@ class Elevator:
         self.upper_bound = upper
         self.lower_bound = lower
 
-    def _handle_calls(self):
-        """Continuously check the call queue and handle calls."""
+    def __getstate__(self):
+        """Return the state to pickle, without simulation objects."""
+        return detached_state(self)
+
+    def _handle_calls(self, resume=None):
+        """Handle calls in the call queue, waiting idle while there are none.
+
+        resume -- (activity, wake time, process) of an activity to finish
+                  first, when restarted from a snapshot (see
+                  _resume_handling)
+        """
+        if resume is not None:
+            yield from self._resume(*resume)
+        while True:
+            yield from self._serve()
+            if self.call_queue.next_stop(self.direction) is None:
+                yield from self._idle()
+
+    def _serve(self):
+        """Serve all accessible calls in current direction, then turn."""
         while True:
-            yield self.env.timeout(1)
-            # Serve all accessible calls in current direction
-            while True:
-                next_stop = self.call_queue.next_stop(self.direction)
-                if next_stop is None:
-                    break
-                yield self.env.process(self._move_to(next_stop))
-                yield self.env.process(self._drop_off())
-                yield self.env.process(self._pick_up())
-            self.call_queue.swap_reachable(self.direction)
-            # Check other direction
-            if self.call_queue.get_reachable_pickups(-self.direction):
-                self._switch_service_direction()
-                start = self.call_queue.next_stop(self.direction)
-                yield self.env.process(self._move_to(start))
+            next_stop = self.call_queue.next_stop(self.direction)
+            if next_stop is None:
+                break
+            self._activity = "move"
+            yield self.env.process(self._move_to(next_stop))
+            self._activity = "stop"
+            yield from self._stop()
+        self.call_queue.swap_reachable(self.direction)
+        # Check other direction
+        if self.call_queue.has_reachable_pickups(-self.direction):
+            self._switch_service_direction()
+            start = self.call_queue.next_stop(self.direction)
+            self._activity = "start"
+            yield self.env.process(self._move_to(start))
+
+    def _idle(self, wake=None):
+        """Wait until a call is received.
+
+        Idle elevators are woken by _recalibrate() rather than polling the
+        call queue, so they cost no events. With a parking policy, the
+        elevator parks instead if no call is received within the parking
+        delay.
+
+        wake -- time the parking delay elapses (when restarted from a
+                snapshot)
+        """
+        self._activity = "idle"
+        self._work = self.env.event()
+        if self.park is None:
+            yield self._work
+        else:
+            if wake is None:
+                wake = self.env.now + self.parking_delay
+            self._wait = self.env.timeout(wake - self.env.now)
+            yield self._work | self._wait
+            if not self._work.triggered:
+                self._work = None
+                yield from self._park()
+        self._work = None
+
+    def _park(self):
+        """Move to the floor the parking policy chooses, if any."""
+        target = self.park(self)
+        if target is None or target == self.floor:
+            return
+        if (target - self.floor) * self.direction < 0:
+            self._switch_service_direction()
+        self._activity = "park"
+        yield self.env.process(self._move_to(target))
+
+    def _stop_parking(self):
+        """Cut the parking trip in progress short at the next floor."""
+        floor = self.floor
+        if self.position() != floor:
+            floor += self._trip_step
+        if floor != self._trip_target:
+            self._trip_target = floor
+            self._trip.interrupt()
+
+    def _resume_handling(self, wake):
+        """Restart call handling from a snapshot.
+
+        wake -- time at which the pending timeout of the handler's activity
+                was due (None if idle without a parking policy)
+
+        The activity is what the handler was doing: 'idle' (waiting for a
+        call), 'move', 'start' or 'park' (a trip in the current direction,
+        to the starting floor of a new direction or to the parking floor)
+        or 'stop' (serving a floor). The process finishing an interrupted
+        trip is started right away, so that its timeout is scheduled in the
+        order of the snapshot.
+        """
+        activity = self._activity
+        if activity in ("move", "start", "park"):
+            process = self.env.process(self._resume_trip())
+        else:
+            process = None
+        self.call_handler = self.env.process(
+            self._handle_calls((activity, wake, process)))
+
+    def _resume(self, activity, wake, process):
+        """Finish the activity call handling was restarted in."""
+        if activity == "idle":
+            yield from self._idle(wake)
+        elif activity == "stop":
+            yield from self._stop(wake)
+        else:
+            yield process
+            if activity == "move":
+                self._activity = "stop"
+                yield from self._stop()
+            elif (activity == "start"
+                    and self.call_queue.next_stop(self.direction) is None):
+                yield from self._idle()
 
     def enqueue(self, call):
         """Enqueue the given call in the call pipe.
@@ -117,12 +272,38 @@ class Elevator:
         """
         while True:
             call = yield self.call_pipe.get()
-            print_status(self.env.now, f"Elevator {self.id} received call {call.id} at floor {self.floor}")
+            if self.tracer.level <= INFO:
+                self.tracer.emit(self.env.now, INFO, "receive",
+                                 elevator=self.id, call=call.id,
+                                 floor=self.floor)
             self._recalibrate(call)
 
     def _recalibrate(self, call):
         """Add the given call to the call queue."""
+        call.elevator_id = self.id
         self.call_queue.add(call, self.direction, self.floor)
+        if self._work is not None:
+            if not self._work.triggered:
+                self._work.succeed()
+        elif self._trip is not None:
+            if self._activity == "park":
+                self._stop_parking()
+            elif self.intercept:
+                self._intercept(call)
+
+    def _intercept(self, call):
+        """Shorten the trip in progress if call can be picked up on the way.
+
+        The call must head in the direction of service, and its source must
+        lie strictly between the elevator's position and the trip's target.
+        """
+        step = self._trip_step
+        if call.direction != self.direction or step != self.direction:
+            return
+        if ((call.source - self.position()) * step > 0
+                and (self._trip_target - call.source) * step > 0):
+            self._trip_target = call.source
+            self._trip.interrupt()
 
     def _switch_service_direction(self):
         """Switch service direction."""
@@ -137,53 +318,140 @@ class Elevator:
         Normally, target floor lies in direction of travel while elevator is
         handling each call in a single direction. Exceptional case is when
         elevator switches directions and moves to its new starting floor.
+
+        The whole trip elapses as a single timeout. Intermediate floors are
+        derived from the trip's start time when needed (see floor and
+        position()), and the trip is interrupted when _intercept() moves its
+        target closer.
         """
         if (target_floor is None
                 or not (self.lower_bound <= target_floor <= self.upper_bound)):
             raise InvalidFloorError("Cannot move to specified floor.")
-        print_status(self.env.now, f"Elevator {self.id} started moving"
-                                   f" {to_string(self.direction)} to"
-                                   f" {target_floor}")
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "move", elevator=self.id,
+                             direction=to_string(self.direction),
+                             target=target_floor)
         if target_floor - self.floor > 0:
             step = 1
         else:
             step = -1
-        while self.floor != target_floor:
-            yield self.env.timeout(self.f2f_time)
-            self.floor += step
-            print(f"floor updated to {self.floor}")
-        print_status(self.env.now, f"Elevator {self.id} is now at floor {self.floor}")
-
-    def _pick_up(self):
-        """Pick up as many passengers as possible on the current floor.
-
-        Pick up as many passengers as the Elevator's capacity allows. If the
-        Elevator reaches maximum capacity, passengers are left on the current
-        floor to be handled at a later time.
+        if target_floor != self.floor:
+            self._trip_start = self.env.now
+            self._trip_step = step
+            self._trip_target = target_floor
+            yield from self._travel()
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "arrive", elevator=self.id,
+                             floor=self.floor)
+
+    def _resume_trip(self):
+        """Finish the trip in progress when a snapshot was taken."""
+        yield from self._travel()
+        if self.tracer.level <= INFO:
+            self.tracer.emit(self.env.now, INFO, "arrive", elevator=self.id,
+                             floor=self.floor)
+
+    def _travel(self):
+        """Elapse the rest of the trip set up in the trip attributes."""
+        self._trip = self.env.active_process
+        while True:
+            remaining = (abs(self._trip_target - self._floor) * self.f2f_time
+                         - (self.env.now - self._trip_start))
+            try:
+                self._wait = self.env.timeout(remaining)
+                yield self._wait
+                break
+            except simpy.Interrupt:
+                # Target was moved closer, wait for the remaining time
+                if self.tracer.level <= INFO:
+                    self.tracer.emit(self.env.now, INFO, "intercept",
+                                     elevator=self.id,
+                                     target=self._trip_target)
+        self.floor = self._trip_target
+        self._trip = None
+        self._trip_start = None
+
+    def _stop(self, wake=None):
+        """Serve the current floor: open the doors, let passengers off and
+        on, and close the doors.
+
+        All passengers waiting to get off alight, then as many passengers as
+        the Elevator's capacity allows board. If the Elevator reaches maximum
+        capacity, passengers are left on the current floor to be handled at
+        a later time.
+
+        The stop elapses as a single timeout, whose duration is computed
+        once for the whole batch of passengers: door open time, drop-off
+        duration per alighting passenger, pick-up duration per boarding
+        passenger and door close time. Each passenger's own times are still
+        recorded, once the doors have closed: a call is completed once its
+        passenger has alighted, and picked up once its passenger starts
+        boarding. The doors are not opened if nobody gets off or on.
+
+        wake -- if given, finish the stop in progress when a snapshot was
+                taken, at time wake
         """
-        while self.call_queue.get_pickups(self.direction, self.floor):
+        if wake is None:
+            alighted, boarded, wake = self._exchange_passengers()
+            if not alighted and not boarded:
+                return
+        self._wait = self.env.timeout(wake - self.env.now)
+        yield self._wait
+        alighted, boarded, completions, pickups = self._boarding
+        for call, time in zip(alighted, completions):
+            call.completed(time)
+        for call, time in zip(boarded, pickups):
+            call.picked_up(time)
+        if self.tracer.level <= INFO:
+            load = self.curr_capacity - len(boarded) + len(alighted)
+            for call in alighted:
+                load -= 1
+                self.tracer.emit(self.env.now, INFO, "dropoff",
+                                 elevator=self.id, floor=self.floor,
+                                 call=call.id, load=load)
+            for call in boarded:
+                load += 1
+                self.tracer.emit(self.env.now, INFO, "pickup",
+                                 elevator=self.id, floor=self.floor,
+                                 call=call.id, load=load)
+        self._boarding = None
+
+    def _exchange_passengers(self):
+        """Take calls off and on at the current floor and schedule their
+        timestamps.
+
+        The calls and the times at which they are completed or picked up
+        are kept until the stop is over. Return a
+        tuple (alighted calls, boarded calls, time at which the doors are
+        closed again).
+        """
+        call_queue = self.call_queue
+        floor = self.floor
+        alighted = []
+        while call_queue.get_dropoffs(floor):
+            alighted.append(call_queue.next_dropoff(floor))
+        self.curr_capacity -= len(alighted)
+        boarded = []
+        while call_queue.get_pickups(self.direction, floor):
             if self.curr_capacity >= self.max_capacity:
-                print_status(self.env.now, f"Elevator {self.id} is full.")
-                self.call_queue.reject_reachable(self.direction, self.floor)
+                if self.tracer.level <= INFO:
+                    self.tracer.emit(self.env.now, INFO, "full",
+                                     elevator=self.id)
+                call_queue.reject_reachable(self.direction, floor)
                 break
-            call = self.call_queue.next_pickup(self.direction, self.floor)
-            call.picked_up(self.env.now)
-            yield self.env.timeout(self.pickup_duration)
+            boarded.append(call_queue.next_pickup(self.direction, floor))
             self.curr_capacity += 1
-            print_status(self.env.now,
-                         f"(pick up) Elevator {self.id} at floor {self.floor}"
-                         f", capacity now {self.curr_capacity}")
-
-    def _drop_off(self):
-        """Drop off all passengers waiting to get off at current floor."""
-        while self.call_queue.get_dropoffs(self.floor):
-            call = self.call_queue.next_dropoff(self.floor)
-            call.completed(self.env.now)
-            self.curr_capacity -= 1
-            yield self.env.timeout(self.dropoff_duration)
-            print_status(self.env.now,
-                         f"(drop off) Elevator {self.id} at floor "
-                         f"{self.floor}, capacity now {self.curr_capacity}")
+        time = self.env.now + self.door_open_time
+        completions = []
+        for _ in alighted:
+            time += self.dropoff_duration
+            completions.append(time)
+        pickups = []
+        for _ in boarded:
+            pickups.append(time)
+            time += self.pickup_duration
+        self._boarding = (alighted, boarded, completions, pickups)
+        return alighted, boarded, time + self.door_close_time
 
     def _move_one_floor(self):
         """Elapse time required to move one floor."""
@@ -226,6 +494,9 @@ class CallManager:
 
     (* SCAN denotes the SCAN algorithm as explained in Elevator class
     documentation.)
+
+    Every change to the tree increments the manager's version, so that
+    others (e.g. dispatchers) can cache what they derive from it.
     """
 
     def __init__(self, num_floors):
@@ -236,6 +507,7 @@ class CallManager:
         """
         self._lower_bound = 1
         self._upper_bound = num_floors
+        self.version = 0
         self._all_calls = {
             # pickups
             1: {
@@ -280,6 +552,26 @@ class CallManager:
         """Return all reachable pickups in given direction."""
         return self._all_calls[1][bitify(direction)][1]
 
+    def get_unreachable_pickups(self, direction):
+        """Return all unreachable pickups in given direction."""
+        return self._all_calls[1][bitify(direction)][0]
+
+    def pickup_mask(self, direction):
+        """Return a bitmask of floors with pickups in given direction.
+
+        Bit f is set if floor f has reachable or unreachable pickups.
+        """
+        d_bit = bitify(direction)
+        mask = 0
+        for reachable_bit in (1, 0):
+            for flr in self._all_calls[1][d_bit][reachable_bit]:
+                mask |= 1 << flr
+        return mask
+
+    def has_reachable_pickups(self, direction):
+        """Return True if there are reachable pickups in given direction."""
+        return bool(self._all_calls[1][bitify(direction)][1])
+
     def _in_range(self, floor):
         """Return True if floor is maintained by self. False otherwise."""
         return self._lower_bound <= floor <= self._upper_bound
@@ -290,6 +582,10 @@ class CallManager:
         call       -- Call instance to be added
         direction  -- current direction of travel
         floor -- current floor
+
+        A call heading in direction is reachable if the current sweep
+        passes its floor (see _on_sweep), and unreachable otherwise.
+        Calls heading the other way are reachable in the next sweep.
         """
         if direction is not UP and direction is not DOWN:
             raise InvalidCallError("Invalid direction. Call could not be "
@@ -297,6 +593,7 @@ class CallManager:
         if not self._in_range(call.source):
             raise InvalidCallError("Out of range. Call could not be added "
                                    "to CallManager.")
+        self.version += 1
         if call.direction != direction:
             # add call to opposite direction, reachable
             tmp = self._all_calls[1][bitify(call.direction)][1]
@@ -307,8 +604,7 @@ class CallManager:
         else:
             # add call to same direction, reachable or unreachable
             direction_bit = bitify(direction)
-            if (call.source >= curr_floor and direction == UP
-                    or call.source <= curr_floor and direction == DOWN):
+            if self._on_sweep(call.source, direction, curr_floor):
                 reachable_bit = 1
             else:
                 reachable_bit = 0
@@ -318,6 +614,20 @@ class CallManager:
             except KeyError:
                 tmp[call.source] = deque([call])
 
+    def _on_sweep(self, floor, direction, curr_floor):
+        """Return True if the current sweep in direction passes floor.
+
+        The sweep starts from curr_floor, unless the elevator is heading
+        back to a stop behind it to start the sweep there (e.g. after
+        reversing): floors between that stop and curr_floor are then
+        passed too. The stop is the first one in direction, found from the
+        floor index without going through the calls.
+        """
+        if (floor - curr_floor) * direction >= 0:
+            return True
+        start = self.next_stop(direction)
+        return start is not None and (floor - start) * direction >= 0
+
     def _add_dropoff(self, call):
         """Adds given call to dropoffs."""
         try:
@@ -339,6 +649,7 @@ class CallManager:
         if not ((call.dest - curr_floor) * direction > 0):
             raise InvalidCallError("Call destination was not in direction"
                                    " of travel.")
+        self.version += 1
         if not pickups:
             del self._all_calls[1][bitify(direction)][1][curr_floor]
         self._add_dropoff(call)
@@ -354,6 +665,7 @@ class CallManager:
             call = dropoffs.popleft()
         except IndexError:
             return None
+        self.version += 1
         if not dropoffs:
             del self._all_calls[0][curr_floor]
         return call
@@ -375,14 +687,267 @@ class CallManager:
             all_floors = [flr for flr in pickups] + [flr for flr in dropoffs]
             return f(all_floors)
 
+    def next_stop_from(self, direction, curr_floor):
+        """Return the next floor requiring service from curr_floor onwards.
+
+        Only floors at or beyond curr_floor in given direction are
+        considered. Return None if there is no such floor.
+        """
+        if direction == UP:
+            floors = [flr for flr in self.get_reachable_pickups(direction)
+                      if flr >= curr_floor]
+            floors += [flr for flr in self.get_all_dropoffs()
+                       if flr >= curr_floor]
+            return min(floors, default=None)
+        elif direction == DOWN:
+            floors = [flr for flr in self.get_reachable_pickups(direction)
+                      if flr <= curr_floor]
+            floors += [flr for flr in self.get_all_dropoffs()
+                       if flr <= curr_floor]
+            return max(floors, default=None)
+        else:
+            raise InvalidDirectionError("Invalid direction. "
+                                        "Cannot find next floor.")
+
+    def swap_reachable(self, direction):
+        """Swap reachable and unreachable pickups for given direction.
+
+        Called when elevator switches direction. For preparing reachable calls
+        in advance for the next cycle."""
+        d_bit = bitify(direction)
+        pickups = self._all_calls[1][d_bit]
+        if not pickups[1] and not pickups[0]:
+            return
+        self.version += 1
+        pickups[1], pickups[0] = pickups[0], pickups[1]
+
+    def reject_reachable(self, direction, curr_floor):
+        """Mark all reachable calls in direction and floor as unreachable.
+
+        Called when elevator cannot accommodate reachable calls for whatever
+        reason (usually when full) and postpones their service until the next
+        cycle.
+        """
+        d_bit = bitify(direction)
+        reachable = self._all_calls[1][d_bit][1].pop(curr_floor, None)
+        if not reachable:
+            return
+        self.version += 1
+        unreachable = self._all_calls[1][d_bit][0]
+        if curr_floor in unreachable:
+            unreachable[curr_floor].extend(reachable)
+        else:
+            unreachable[curr_floor] = reachable
+
+
+class BitsetCallManager:
+    """Maintain unhandled calls of an elevator, indexed by floor bitmasks.
+
+    Calls are organized in the same tree as in CallManager, and both classes
+    share the same interface. Each leaf (DROP-OFFS, REACHABLE, UNREACHABLE)
+    is instead implemented as a list of queues indexed by floor number, plus
+    an integer bitmask whose bit f is set if and only if the queue for floor
+    f is non-empty. Finding the next floor to serve in either direction is
+    then a couple of integer operations on the masks, independent of the
+    number of pending calls, and queues are reused rather than reallocated.
+
+    Suited to tall buildings and long call queues.
+    """
+
+    def __init__(self, num_floors):
+        """Create an empty BitsetCallManager.
+
+        num_floors -- number of floors in building (range assumed to be 1 to
+                      num_floors)
+        """
+        self._lower_bound = 1
+        self._upper_bound = num_floors
+        self.version = 0
+        size = num_floors + 1
+        # pickups, indexed by [direction bit][reachable bit][floor]
+        self._pickups = [
+            [[deque() for _ in range(size)], [deque() for _ in range(size)]],
+            [[deque() for _ in range(size)], [deque() for _ in range(size)]],
+        ]
+        # pickup masks, indexed by [direction bit][reachable bit]
+        self._pickup_masks = [[0, 0], [0, 0]]
+        # dropoffs, indexed by floor
+        self._dropoffs = [deque() for _ in range(size)]
+        self._dropoff_mask = 0
+
+    def get_pickups(self, direction, curr_floor):
+        """Return pickups for given direction and floor."""
+        if not self._in_range(curr_floor):
+            return None
+        return self._pickups[bitify(direction)][1][curr_floor]
+
+    def get_dropoffs(self, curr_floor):
+        """Return dropoffs for given floor."""
+        if not self._in_range(curr_floor):
+            return None
+        return self._dropoffs[curr_floor]
+
+    def get_all_dropoffs(self):
+        """Return all dropoffs as a dictionary mapping floor to queue."""
+        return {flr: calls for flr, calls in enumerate(self._dropoffs)
+                if calls}
+
+    def get_reachable_pickups(self, direction):
+        """Return all reachable pickups in given direction as a dictionary
+        mapping floor to queue."""
+        return {flr: calls for flr, calls
+                in enumerate(self._pickups[bitify(direction)][1]) if calls}
+
+    def get_unreachable_pickups(self, direction):
+        """Return all unreachable pickups in given direction as a dictionary
+        mapping floor to queue."""
+        return {flr: calls for flr, calls
+                in enumerate(self._pickups[bitify(direction)][0]) if calls}
+
+    def pickup_mask(self, direction):
+        """Return a bitmask of floors with pickups in given direction.
+
+        Bit f is set if floor f has reachable or unreachable pickups.
+        """
+        masks = self._pickup_masks[bitify(direction)]
+        return masks[0] | masks[1]
+
+    def has_reachable_pickups(self, direction):
+        """Return True if there are reachable pickups in given direction."""
+        return self._pickup_masks[bitify(direction)][1] != 0
+
+    def _in_range(self, floor):
+        """Return True if floor is maintained by self. False otherwise."""
+        return self._lower_bound <= floor <= self._upper_bound
+
+    def add(self, call, direction, curr_floor):
+        """Add call to the BitsetCallManager.
+
+        call       -- Call instance to be added
+        direction  -- current direction of travel
+        floor -- current floor
+
+        A call heading in direction is reachable if the current sweep
+        passes its floor (see _on_sweep), and unreachable otherwise.
+        Calls heading the other way are reachable in the next sweep.
+        """
+        if direction is not UP and direction is not DOWN:
+            raise InvalidCallError("Invalid direction. Call could not be "
+                                   "added to CallManager.")
+        if not self._in_range(call.source):
+            raise InvalidCallError("Out of range. Call could not be added "
+                                   "to CallManager.")
+        self.version += 1
+        if call.direction != direction:
+            # add call to opposite direction, reachable
+            reachable_bit = 1
+        elif self._on_sweep(call.source, direction, curr_floor):
+            reachable_bit = 1
+        else:
+            reachable_bit = 0
+        direction_bit = bitify(call.direction)
+        self._pickups[direction_bit][reachable_bit][call.source].append(call)
+        self._pickup_masks[direction_bit][reachable_bit] |= 1 << call.source
+
+    def _on_sweep(self, floor, direction, curr_floor):
+        """Return True if the current sweep in direction passes floor.
+
+        The sweep starts from curr_floor, unless the elevator is heading
+        back to a stop behind it to start the sweep there (e.g. after
+        reversing): floors between that stop and curr_floor are then
+        passed too. The stop is the first one in direction, found from the
+        floor index without going through the calls.
+        """
+        if (floor - curr_floor) * direction >= 0:
+            return True
+        start = self.next_stop(direction)
+        return start is not None and (floor - start) * direction >= 0
+
+    def _add_dropoff(self, call):
+        """Adds given call to dropoffs."""
+        self._dropoffs[call.dest].append(call)
+        self._dropoff_mask |= 1 << call.dest
+
+    def next_pickup(self, direction, curr_floor):
+        """Pop and return the next pickup at given direction and floor.
+
+        Poppped call is then placed in dropoffs. Return None if there are no
+        calls left to pick up.
+        """
+        pickups = self.get_pickups(direction, curr_floor)
+        if not pickups:
+            return None
+        call = pickups.popleft()
+        if not ((call.dest - curr_floor) * direction > 0):
+            raise InvalidCallError("Call destination was not in direction"
+                                   " of travel.")
+        self.version += 1
+        if not pickups:
+            self._pickup_masks[bitify(direction)][1] &= ~(1 << curr_floor)
+        self._add_dropoff(call)
+        return call
+
+    def next_dropoff(self, curr_floor):
+        """Pop and return the next dropoff at given floor.
+
+        Return None if there are no calls left to drop off.
+        """
+        dropoffs = self.get_dropoffs(curr_floor)
+        if not dropoffs:
+            return None
+        call = dropoffs.popleft()
+        self.version += 1
+        if not dropoffs:
+            self._dropoff_mask &= ~(1 << curr_floor)
+        return call
+
+    def next_stop(self, direction):
+        """Return the next floor that requires service."""
+        mask = self._pickup_masks[bitify(direction)][1] | self._dropoff_mask
+        return self._first_floor(mask, direction)
+
+    def next_stop_from(self, direction, curr_floor):
+        """Return the next floor requiring service from curr_floor onwards.
+
+        Only floors at or beyond curr_floor in given direction are
+        considered. Return None if there is no such floor.
+        """
+        mask = self._pickup_masks[bitify(direction)][1] | self._dropoff_mask
+        if direction == UP:
+            mask = mask >> curr_floor << curr_floor
+        else:
+            mask &= (1 << (curr_floor + 1)) - 1
+        return self._first_floor(mask, direction)
+
+    @staticmethod
+    def _first_floor(mask, direction):
+        """Return the first floor set in mask when travelling in direction.
+
+        Return None if mask is empty.
+        """
+        if not mask:
+            return None
+        if direction == UP:
+            return (mask & -mask).bit_length() - 1
+        elif direction == DOWN:
+            return mask.bit_length() - 1
+        else:
+            raise InvalidDirectionError("Invalid direction. "
+                                        "Cannot find next floor.")
+
     def swap_reachable(self, direction):
         """Swap reachable and unreachable pickups for given direction.
 
         Called when elevator switches direction. For preparing reachable calls
         in advance for the next cycle."""
         d_bit = bitify(direction)
-        self._all_calls[1][d_bit][1], self._all_calls[1][d_bit][0] \
-            = self._all_calls[1][d_bit][0], self._all_calls[1][d_bit][1]
+        pickups = self._pickups[d_bit]
+        masks = self._pickup_masks[d_bit]
+        if not masks[0] and not masks[1]:
+            return
+        self.version += 1
+        pickups[1], pickups[0] = pickups[0], pickups[1]
+        masks[1], masks[0] = masks[0], masks[1]
 
     def reject_reachable(self, direction, curr_floor):
         """Mark all reachable calls in direction and floor as unreachable.
@@ -392,9 +957,14 @@ class CallManager:
         cycle.
         """
         d_bit = bitify(direction)
-        self._all_calls[1][d_bit][0][curr_floor] \
-            .extend(self._all_calls[1][d_bit][1][curr_floor])
-        del self._all_calls[1][d_bit][1][curr_floor]
+        reachable = self._pickups[d_bit][1][curr_floor]
+        if not reachable:
+            return
+        self.version += 1
+        self._pickups[d_bit][0][curr_floor].extend(reachable)
+        reachable.clear()
+        self._pickup_masks[d_bit][0] |= 1 << curr_floor
+        self._pickup_masks[d_bit][1] &= ~(1 << curr_floor)
 
 
 # -- Custom Errors --
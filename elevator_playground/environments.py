@@ -0,0 +1,170 @@
+"""Reinforcement learning environments for call dispatching.
+
+DispatchEnvironment wraps a buildings.DeepReinforcementLearningBuilding in
+the reset()/step() interface popularized by OpenAI Gym: every call to be
+assigned is a decision, whose action is the index of the elevator to
+assign it to. The simulation runs between decisions without any output.
+VectorDispatchEnvironment steps several independent environments in a
+batch, within one process.
+
+Observations are flat array('f') instances (see DispatchEnvironment for
+their layout), which can be wrapped without copying by NumPy or deep
+learning frameworks.
+"""
+
+
+from array import array
+import copy
+
+from elevator_playground.buildings import DeepReinforcementLearningBuilding
+from elevator_playground.utils import UP, DOWN
+
+
+class DispatchEnvironment:
+    """An environment in which an agent assigns calls to elevators.
+
+    Observation layout (all values as 32-bit floats):
+    - source and destination floor of the call to assign, scaled to [0, 1]
+    - for every elevator: its position scaled to [0, 1], its direction
+      (1 for UP, -1 for DOWN), its number of passengers, then one entry per
+      floor set to 1 if the floor has an upward pickup pending, then one
+      entry per floor set to 1 if the floor has a downward pickup pending
+
+    The reward of a step is minus the total wait time, in seconds, of the
+    calls picked up since the previous step. An episode ends once the
+    simulation reaches the horizon.
+    """
+    def __init__(self, num_floors, num_elevators, horizon=36000,
+                 **building_kwargs):
+        """Create an environment.
+
+        num_floors      -- number of floors in the simulated building
+        num_elevators   -- number of elevators (and of actions)
+        horizon         -- simulation time* at which episodes end
+        building_kwargs -- further arguments for the building (e.g. traffic),
+                           by default without keeping call history; every
+                           episode gets its own deep copy, so that stateful
+                           arguments (e.g. a PredictiveParking policy) do
+                           not carry over from one episode to the next
+
+        (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+        """
+        self.num_floors = num_floors
+        self.num_elevators = num_elevators
+        self.horizon = horizon
+        building_kwargs.setdefault("keep_history", False)
+        self.building_kwargs = building_kwargs
+        self.num_actions = num_elevators
+        self.observation_size = 2 + num_elevators * (3 + 2 * num_floors)
+        self.building = None
+        self._total_wait = 0
+
+    def reset(self, seed=None):
+        """Start a new episode and return its first observation."""
+        self.building = DeepReinforcementLearningBuilding(
+            self.num_floors, self.num_elevators, seed=seed,
+            **copy.deepcopy(self.building_kwargs))
+        self._total_wait = 0
+        self._advance()
+        return self.observation()
+
+    def step(self, action):
+        """Assign the pending call to elevator action and run until the next
+        decision.
+
+        Return a tuple (observation, reward, done, info), where info holds
+        the simulation time.
+        """
+        if self.building is None:
+            raise RuntimeError("Environment must be reset before stepping.")
+        self.building.decide(action)
+        done = self._advance()
+        metrics = self.building.metrics
+        total_wait = metrics.pickup_wait.total
+        reward = -(total_wait - self._total_wait) / 10
+        self._total_wait = total_wait
+        info = {"time": self.building.env.now}
+        return self.observation(), reward, done, info
+
+    def _advance(self):
+        """Run the simulation until a decision is needed.
+
+        Return True if the horizon was reached first.
+        """
+        building = self.building
+        env = building.env
+        while building.pending_call is None:
+            if env.peek() >= self.horizon:
+                return True
+            env.step()
+        return False
+
+    def observation(self):
+        """Return the current observation (see class documentation)."""
+        building = self.building
+        scale = max(self.num_floors - 1, 1)
+        values = [0.0, 0.0]
+        call = building.pending_call
+        if call is not None:
+            values[0] = (call.source - 1) / scale
+            values[1] = (call.dest - 1) / scale
+        floors = range(1, self.num_floors + 1)
+        for elevator in building.elevators:
+            values.append((elevator.position() - 1) / scale)
+            values.append(elevator.direction)
+            values.append(elevator.curr_capacity)
+            for direction in (UP, DOWN):
+                mask = elevator.call_queue.pickup_mask(direction)
+                values.extend((mask >> floor) & 1 for floor in floors)
+        return array("f", values)
+
+
+class VectorDispatchEnvironment:
+    """A batch of independent DispatchEnvironments stepped together.
+
+    Environments whose episode ends are reset automatically; the last
+    observation of the finished episode is then given in their info under
+    'final_observation'.
+    """
+    def __init__(self, num_envs, num_floors, num_elevators, horizon=36000,
+                 **building_kwargs):
+        """Create num_envs environments (other arguments as for
+        DispatchEnvironment)."""
+        self.envs = [DispatchEnvironment(num_floors, num_elevators, horizon,
+                                         **building_kwargs)
+                     for _ in range(num_envs)]
+        self.num_envs = num_envs
+        self.num_actions = num_elevators
+        self.observation_size = self.envs[0].observation_size
+        self._seeds = [None] * num_envs
+
+    def reset(self, seed=None):
+        """Reset all environments and return their observations.
+
+        If seed is given, environment i is seeded with seed + i, and its
+        later episodes with seeds increasing by num_envs.
+        """
+        if seed is not None:
+            self._seeds = [seed + i for i in range(self.num_envs)]
+        else:
+            self._seeds = [None] * self.num_envs
+        return [env.reset(seed) for env, seed in zip(self.envs, self._seeds)]
+
+    def step(self, actions):
+        """Step every environment with its action.
+
+        Return a tuple of lists (observations, rewards, dones, infos).
+        """
+        observations, rewards, dones, infos = [], [], [], []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, reward, done, info = env.step(action)
+            if done:
+                info["final_observation"] = observation
+                if self._seeds[i] is not None:
+                    self._seeds[i] += self.num_envs
+                observation = env.reset(self._seeds[i])
+            observations.append(observation)
+            rewards.append(reward)
+            dones.append(done)
+            infos.append(info)
+        return observations, rewards, dones, infos
@@ -0,0 +1,287 @@
+"""Columnar export of per-call records and elevator timelines.
+
+A ResultsExporter attached to a session (Session(building, runtime,
+exporter=ResultsExporter("results"))) writes two tables while the session
+runs:
+
+calls    -- one row per completed call: bank, id, source, dest, elevator id,
+            orig time, wait time and process time
+timeline -- one row per change of elevator state: time, bank, elevator,
+            floor, direction (of service, 1 for UP and -1 for DOWN) and
+            load. Rows are written when an elevator starts moving, when it
+            arrives, and once per passenger getting off or on, all stamped
+            with the end of the stop (its passengers are exchanged in one
+            go, see elevators.Elevator), with the load after each of them;
+            elevators move at constant speed in between.
+
+Times are in simulation units (0.1 seconds), and bank is the index of the
+building in the session. Rows are buffered in typed arrays and written in
+chunks, so that memory use does not grow with the length of the run.
+
+Tables are written as Parquet files (<prefix>_calls.parquet and
+<prefix>_timeline.parquet) if pyarrow is installed, or else into a single
+NPZ archive (<prefix>.npz) holding one .npy array per column and chunk,
+named '<table>.<column>.<chunk>'. NPZ archives are written without NumPy;
+read them back with load_npz().
+"""
+
+
+import ast
+from array import array
+import struct
+import sys
+import zipfile
+
+from elevator_playground.metrics import ChainedObserver
+from elevator_playground.tracing import INFO, Tracer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# -- Table columns and their array typecodes --
+CALL_COLUMNS = (("bank", "q"), ("id", "q"), ("source", "q"), ("dest", "q"),
+                ("elevator_id", "q"), ("orig_time", "d"),
+                ("wait_time", "d"), ("process_time", "d"))
+TIMELINE_COLUMNS = (("time", "d"), ("bank", "q"), ("elevator", "q"),
+                    ("floor", "q"), ("direction", "b"), ("load", "q"))
+# ----
+
+
+# -- Trace events that change the state of an elevator --
+TIMELINE_EVENTS = frozenset(("move", "arrive", "pickup", "dropoff"))
+# ----
+
+
+NPY_MAGIC = b"\x93NUMPY"
+
+
+class ResultsExporter:
+    """Write the calls and elevator timelines of a session, in chunks.
+
+    The session attaches the exporter when it starts running and detaches
+    it, closing the files, when it is done.
+    """
+    def __init__(self, prefix, format=None, chunk_size=65536):
+        """Create an exporter.
+
+        prefix     -- path of the files written, without extension
+        format     -- 'parquet' (requires pyarrow) or 'npz', by default
+                      'parquet' if pyarrow is installed and 'npz' otherwise
+        chunk size -- number of rows of a table buffered before writing
+        """
+        if format is None:
+            format = "parquet" if pyarrow is not None else "npz"
+        if format not in ("parquet", "npz"):
+            raise ExportError(f"Unknown export format '{format}'.")
+        if format == "parquet" and pyarrow is None:
+            raise ImportError("Parquet export requires pyarrow.")
+        self.prefix = prefix
+        self.format = format
+        self.chunk_size = chunk_size
+        self._writer = None
+        self._calls = None
+        self._timeline = None
+        self._attached = []
+
+    def attach(self, buildings):
+        """Open the files and start recording the calls and elevators of
+        buildings."""
+        if self._writer is not None:
+            raise ExportError("Exporter is already attached.")
+        if self.format == "parquet":
+            self._writer = _ParquetWriter(self.prefix)
+        else:
+            self._writer = _NpzWriter(self.prefix + ".npz")
+        self._calls = _Table("calls", CALL_COLUMNS, self._writer,
+                             self.chunk_size)
+        self._timeline = _Table("timeline", TIMELINE_COLUMNS, self._writer,
+                                self.chunk_size)
+        for bank, building in enumerate(buildings):
+            recorder = _CallRecorder(self._calls, bank,
+                                     building.metrics.parent)
+            building.metrics.parent = recorder
+            tracer = building.tracer
+            building.set_tracer(_TimelineTracer(self._timeline, bank,
+                                                building, tracer))
+            self._attached.append((building, tracer))
+
+    def detach(self):
+        """Stop recording, write the remaining rows and close the files."""
+        if self._writer is None:
+            return
+        for building, tracer in self._attached:
+            building.metrics.parent = building.metrics.parent.parent
+            building.set_tracer(tracer)
+        self._attached = []
+        self._calls.flush()
+        self._timeline.flush()
+        self._writer.close()
+        self._writer = None
+
+
+class _Table:
+    """Rows of a table buffered column-wise, written in chunks."""
+    def __init__(self, name, columns, writer, chunk_size):
+        self.name = name
+        self.columns = {column: array(typecode)
+                        for column, typecode in columns}
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self._chunks = 0
+
+    def append(self, row):
+        """Append a row, given as a tuple of values in column order."""
+        for column, value in zip(self.columns.values(), row):
+            column.append(value)
+        if len(column) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows, if any, as a chunk."""
+        if not len(next(iter(self.columns.values()))):
+            return
+        self.writer.write(self.name, self._chunks, self.columns)
+        self._chunks += 1
+        for column in self.columns.values():
+            del column[:]
+
+
+class _CallRecorder(ChainedObserver):
+    """Observer of a building's calls (see metrics.CallMetrics.parent)
+    appending a row for every completed call."""
+    def __init__(self, table, bank, parent):
+        super().__init__(parent)
+        self.table = table
+        self.bank = bank
+
+    def on_completion(self, call):
+        self.table.append((self.bank, call.id, call.source, call.dest,
+                           call.elevator_id, call.orig_time, call.wait_time,
+                           call.process_time))
+        super().on_completion(call)
+
+
+class _TimelineTracer(Tracer):
+    """Tracer of a building appending a timeline row for every event that
+    changes the state of an elevator, and passing events on to the
+    session's tracer."""
+    def __init__(self, table, bank, building, tracer):
+        super().__init__(min(tracer.level, INFO))
+        self.table = table
+        self.bank = bank
+        self.building = building
+        self.tracer = tracer
+
+    def emit(self, time, level, event, **fields):
+        if event in TIMELINE_EVENTS:
+            elevator = self.building.elevators[fields["elevator"]]
+            self.table.append((time, self.bank, elevator.id,
+                               fields.get("floor", elevator.floor),
+                               elevator.direction,
+                               fields.get("load", elevator.curr_capacity)))
+        if level >= self.tracer.level:
+            self.tracer.emit(time, level, event, **fields)
+
+
+class _NpzWriter:
+    """Write chunks of columns as .npy entries of a zip archive."""
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, table, chunk, columns):
+        for name, column in columns.items():
+            self._zip.writestr(f"{table}.{name}.{chunk:05d}.npy",
+                               _npy_bytes(column))
+
+    def close(self):
+        self._zip.close()
+
+
+class _ParquetWriter:
+    """Write chunks of columns as row groups of one Parquet file per
+    table."""
+    TYPES = {"q": "int64", "d": "float64", "b": "int8"}
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._writers = {}
+
+    def write(self, table, chunk, columns):
+        arrays = {
+            name: pyarrow.Array.from_buffers(
+                getattr(pyarrow, self.TYPES[column.typecode])(), len(column),
+                [None, pyarrow.py_buffer(column.tobytes())])
+            for name, column in columns.items()
+        }
+        data = pyarrow.table(arrays)
+        if table not in self._writers:
+            self._writers[table] = pyarrow.parquet.ParquetWriter(
+                f"{self.prefix}_{table}.parquet", data.schema)
+        self._writers[table].write_table(data)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+def _npy_bytes(column):
+    """Return a one-dimensional array('q', 'd' or 'b') in .npy format."""
+    if column.typecode == "b":
+        descr = "|i1"
+    else:
+        order = "<" if sys.byteorder == "little" else ">"
+        kind = "f" if column.typecode == "d" else "i"
+        descr = f"{order}{kind}{column.itemsize}"
+    header = (f"{{'descr': '{descr}', 'fortran_order': False, "
+              f"'shape': ({len(column)},), }}")
+    # Magic, version and header length take 10 bytes; the header is padded
+    # so that the data is 64-byte aligned
+    padding = 63 - (10 + len(header)) % 64
+    header = header + " " * padding + "\n"
+    return (NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header))
+            + header.encode("latin1") + column.tobytes())
+
+
+def load_npz(path):
+    """Return the tables of an NPZ archive written by a ResultsExporter.
+
+    Tables are given as a dictionary mapping table name to a dictionary
+    mapping column name to an array (of the array module), with the chunks
+    of each column concatenated.
+    """
+    tables = {}
+    with zipfile.ZipFile(path) as archive:
+        for entry in archive.namelist():
+            table, column, _, _ = entry.split(".")
+            data = archive.read(entry)
+            if not data.startswith(NPY_MAGIC):
+                raise ExportError(f"Entry {entry} is not a .npy array.")
+            header_length = struct.unpack("<H", data[8:10])[0]
+            header = ast.literal_eval(
+                data[10:10 + header_length].decode("latin1"))
+            typecode = _TYPECODES[header["descr"][1:]]
+            values = array(typecode)
+            values.frombytes(data[10 + header_length:])
+            if header["descr"][0] == (">" if sys.byteorder == "little"
+                                      else "<"):
+                values.byteswap()
+            columns = tables.setdefault(table, {})
+            if column in columns:
+                columns[column].extend(values)
+            else:
+                columns[column] = values
+    return tables
+
+
+_TYPECODES = {"i1": "b", "i8": "q", "f8": "d"}
+
+
+# -- Custom Errors --
+class ExportError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,85 @@
+"""Student t confidence intervals of sample means.
+
+Shared by replications (intervals over independent replications) and
+convergence (intervals over batch means of a single run). Critical values
+come from a table rather than from an inverse distribution function, so the
+supported confidence levels are those of T_TABLE.
+"""
+
+
+import math
+
+
+# -- Two-sided Student t critical values by confidence level --
+# Values for 1 to 30 degrees of freedom, then for 40, 60, 120 and infinity.
+T_DEGREES = tuple(range(1, 31)) + (40, 60, 120, math.inf)
+T_TABLE = {
+    0.90: (6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833,
+           1.812, 1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734,
+           1.729, 1.725, 1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703,
+           1.701, 1.699, 1.697, 1.684, 1.671, 1.658, 1.645),
+    0.95: (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+           2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+           2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+           2.048, 2.045, 2.042, 2.021, 2.000, 1.980, 1.960),
+    0.99: (63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250,
+           3.169, 3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878,
+           2.861, 2.845, 2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771,
+           2.763, 2.756, 2.750, 2.704, 2.660, 2.617, 2.576),
+}
+# ----
+
+
+def confidence_interval(samples, confidence=0.95):
+    """Return the mean of samples with its Student t confidence interval.
+
+    The result is a dictionary with the number of samples (n), their mean
+    and standard deviation (stdev), the half width of the interval and its
+    bounds (low, high). The mean is None without samples, and the spread
+    and interval are None with fewer than 2.
+    """
+    n = len(samples)
+    estimate = {"n": n, "mean": None, "stdev": None, "half_width": None,
+                "low": None, "high": None}
+    if not n:
+        return estimate
+    mean = sum(samples) / n
+    estimate["mean"] = mean
+    if n < 2:
+        return estimate
+    stdev = math.sqrt(sum((x - mean) ** 2 for x in samples) / (n - 1))
+    half_width = t_quantile(n - 1, confidence) * stdev / math.sqrt(n)
+    estimate.update(stdev=stdev, half_width=half_width,
+                    low=mean - half_width, high=mean + half_width)
+    return estimate
+
+
+def t_quantile(degrees, confidence=0.95):
+    """Return the two-sided Student t critical value for the given degrees
+    of freedom and confidence level.
+
+    Degrees of freedom between those of T_TABLE are rounded down, which
+    slightly widens intervals.
+
+    >>> t_quantile(9)
+    2.262
+    >>> t_quantile(50, 0.99)
+    2.704
+    """
+    if confidence not in T_TABLE:
+        raise IntervalError(f"Unsupported confidence level {confidence} "
+                            f"(use one of {sorted(T_TABLE)}).")
+    if degrees < 1:
+        raise IntervalError("Confidence intervals need at least 2 "
+                            "samples.")
+    values = T_TABLE[confidence]
+    for i in range(len(T_DEGREES) - 1, -1, -1):
+        if T_DEGREES[i] <= degrees:
+            return values[i]
+
+
+# -- Custom Errors --
+class IntervalError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,395 @@
+"""A lightweight discrete-event kernel, compatible with the subset of SimPy
+that buildings and elevators use.
+
+kernel.Environment can stand in for simpy.Environment: pass it to every
+building of a session as env (or set engine to 'kernel' in a sweep
+configuration). It supports timeouts, plain events, generator processes
+(with interrupts), events combined with '|' and unbounded stores, and
+processes events in exactly the order SimPy would, so simulations give
+identical results on either engine.
+
+It is specialised to that subset: events use slots, the current time is
+a plain attribute, stores never have to queue puts, and processes skip
+SimPy's generality (Python 2 support, resource request queues, bound event
+classes). The gain is modest, about 1.1-1.3x on the benchmark scenarios,
+where dispatching rather than event handling takes most of the time, so
+the kernel is opt-in: SimPy remains the engine unless a kernel.Environment
+is given. SimPy's exceptions (simpy.Interrupt, EmptySchedule,
+StopSimulation) are reused, so code catching them works on both engines.
+
+Like SimPy's, the environment processes events through its step() and
+schedule() methods, which profiling.Profiler can instrument.
+"""
+
+
+from heapq import heappop, heappush
+from itertools import count
+
+import simpy
+from simpy.core import EmptySchedule, Infinity, StopSimulation
+
+
+# -- Event priorities, as in SimPy --
+URGENT = 0
+NORMAL = 1
+# ----
+
+
+PENDING = simpy.events.PENDING
+
+
+class Environment:
+    """Execution environment stepping from event to event (see
+    simpy.Environment)."""
+    def __init__(self, initial_time=0):
+        """Create an environment starting at initial_time.
+
+        now -- current simulation time
+        """
+        self.now = initial_time
+        self._queue = []
+        self._eid = count()
+        self._active_proc = None
+
+    @property
+    def _now(self):
+        """Current simulation time (alias of now, as named by SimPy)."""
+        return self.now
+
+    @_now.setter
+    def _now(self, now):
+        self.now = now
+
+    @property
+    def active_process(self):
+        """Return the process currently running, or None."""
+        return self._active_proc
+
+    def event(self):
+        """Return a new, untriggered event."""
+        return Event(self)
+
+    def timeout(self, delay, value=None):
+        """Return an event triggered after delay."""
+        return Timeout(self, delay, value)
+
+    def process(self, generator):
+        """Start a process running generator and return it."""
+        return Process(self, generator)
+
+    def schedule(self, event, priority=NORMAL, delay=0):
+        """Schedule event with given priority after delay."""
+        heappush(self._queue, (self.now + delay, priority, next(self._eid),
+                               event))
+
+    def peek(self):
+        """Return the time of the next event (Infinity if there is none)."""
+        try:
+            return self._queue[0][0]
+        except IndexError:
+            return Infinity
+
+    def step(self):
+        """Process the next event.
+
+        Raise EmptySchedule if there are no events left.
+        """
+        try:
+            self.now, _, _, event = heappop(self._queue)
+        except IndexError:
+            raise EmptySchedule()
+        callbacks, event.callbacks = event.callbacks, None
+        for callback in callbacks:
+            callback(event)
+        if not event._ok and not hasattr(event, "_defused"):
+            exc = type(event._value)(*event._value.args)
+            exc.__cause__ = event._value
+            raise exc
+
+    def run(self, until=None):
+        """Process events until there are none left, until is processed
+        (if an event) or the time until is reached (if a number).
+
+        Return the value of until if it is an event.
+        """
+        if until is not None:
+            if not isinstance(until, Event):
+                at = float(until)
+                if at <= self.now:
+                    raise ValueError(f"until(={at}) should be > the current "
+                                     f"simulation time.")
+                until = Event(self)
+                until._ok = True
+                until._value = None
+                self.schedule(until, URGENT, at - self.now)
+            elif until.callbacks is None:
+                return until._value
+            until.callbacks.append(StopSimulation.callback)
+        # Looked up once per run, after any instrumentation is installed
+        step = self.step
+        try:
+            while True:
+                step()
+        except StopSimulation as exc:
+            return exc.args[0]
+        except EmptySchedule:
+            if until is not None:
+                raise RuntimeError(f"No scheduled events left but 'until' "
+                                   f"event was not triggered: {until}")
+
+
+class Event:
+    """An event that may happen at some point in time (see
+    simpy.events.Event)."""
+    __slots__ = ("env", "callbacks", "_value", "_ok", "_defused")
+
+    def __init__(self, env):
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+
+    @property
+    def triggered(self):
+        """Return True once the event has been triggered."""
+        return self._value is not PENDING
+
+    @property
+    def processed(self):
+        """Return True once the event's callbacks have been invoked."""
+        return self.callbacks is None
+
+    @property
+    def ok(self):
+        """Return True if the event was triggered successfully."""
+        return self._ok
+
+    @property
+    def value(self):
+        """Return the value of the event, once triggered."""
+        if self._value is PENDING:
+            raise AttributeError(f"Value of {self} is not yet available")
+        return self._value
+
+    def succeed(self, value=None):
+        """Trigger the event successfully with value and return it."""
+        if self._value is not PENDING:
+            raise RuntimeError(f"{self} has already been triggered")
+        self._ok = True
+        self._value = value
+        self.env.schedule(self)
+        return self
+
+    def fail(self, exception):
+        """Trigger the event with exception as its failure and return it."""
+        if self._value is not PENDING:
+            raise RuntimeError(f"{self} has already been triggered")
+        if not isinstance(exception, BaseException):
+            raise ValueError(f"{exception} is not an exception.")
+        self._ok = False
+        self._value = exception
+        self.env.schedule(self)
+        return self
+
+    def __or__(self, other):
+        """Return an event triggered once either event is."""
+        return AnyOf(self.env, (self, other))
+
+
+class Timeout(Event):
+    """An event triggered after a delay."""
+    __slots__ = ()
+
+    def __init__(self, env, delay, value=None):
+        if delay < 0:
+            raise ValueError(f"Negative delay {delay}")
+        self.env = env
+        self.callbacks = []
+        self._value = value
+        self._ok = True
+        env.schedule(self, NORMAL, delay)
+
+
+class Initialize(Event):
+    """Start a process (scheduled as urgent, before any interrupt)."""
+    __slots__ = ()
+
+    def __init__(self, env, process):
+        self.env = env
+        self.callbacks = [process._resume]
+        self._value = None
+        self._ok = True
+        env.schedule(self, URGENT)
+
+
+class Interruption(Event):
+    """Throw a simpy.Interrupt into a process, as soon as possible."""
+    __slots__ = ("process",)
+
+    def __init__(self, process, cause):
+        self.env = process.env
+        self.callbacks = [self._interrupt]
+        self._value = simpy.Interrupt(cause)
+        self._ok = False
+        self._defused = True
+        if process._value is not PENDING:
+            raise RuntimeError(f"{process} has terminated and cannot be "
+                               f"interrupted.")
+        if process is self.env._active_proc:
+            raise RuntimeError("A process is not allowed to interrupt "
+                               "itself.")
+        self.process = process
+        self.env.schedule(self, URGENT)
+
+    def _interrupt(self, event):
+        process = self.process
+        if process._value is not PENDING:
+            # Terminated since the interrupt was scheduled
+            return
+        process._target.callbacks.remove(process._resume)
+        process._resume(self)
+
+
+class Process(Event):
+    """A process running a generator that yields events (see
+    simpy.events.Process); triggered once the generator returns."""
+    __slots__ = ("_generator", "_target")
+
+    def __init__(self, env, generator):
+        if not hasattr(generator, "throw"):
+            raise ValueError(f"{generator} is not a generator.")
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._generator = generator
+        self._target = Initialize(env, self)
+
+    @property
+    def target(self):
+        """Return the event the process is waiting for."""
+        return self._target
+
+    @property
+    def is_alive(self):
+        """Return True until the generator exits."""
+        return self._value is PENDING
+
+    def interrupt(self, cause=None):
+        """Interrupt the process, throwing simpy.Interrupt(cause) into it."""
+        Interruption(self, cause)
+
+    def _resume(self, event):
+        """Resume the generator with the outcome of event."""
+        env = self.env
+        env._active_proc = self
+        send = self._generator.send
+        while True:
+            try:
+                if event._ok:
+                    event = send(event._value)
+                else:
+                    event._defused = True
+                    exc = type(event._value)(*event._value.args)
+                    exc.__cause__ = event._value
+                    event = self._generator.throw(exc)
+            except StopIteration as e:
+                event = None
+                self._ok = True
+                self._value = e.args[0] if e.args else None
+                env.schedule(self)
+                break
+            except BaseException as e:
+                event = None
+                self._ok = False
+                e.__traceback__ = e.__traceback__.tb_next
+                self._value = e
+                env.schedule(self)
+                break
+            callbacks = event.callbacks
+            if callbacks is not None:
+                callbacks.append(self._resume)
+                break
+        self._target = event
+        env._active_proc = None
+
+
+class AnyOf(Event):
+    """An event triggered once any of the given events is (see
+    simpy.events.AnyOf). Its value maps the events processed by then to
+    their values."""
+    __slots__ = ("_events", "_count")
+
+    def __init__(self, env, events):
+        self.env = env
+        self.callbacks = []
+        self._value = PENDING
+        self._events = tuple(events)
+        self._count = 0
+        if not self._events:
+            self.succeed({})
+            return
+        for event in self._events:
+            if event.callbacks is None:
+                self._check(event)
+            else:
+                event.callbacks.append(self._check)
+        self.callbacks.append(self._build_value)
+
+    def _check(self, event):
+        if self._value is not PENDING:
+            return
+        self._count += 1
+        if not event._ok:
+            event._defused = True
+            self.fail(event._value)
+        else:
+            self.succeed()
+
+    def _build_value(self, event):
+        for other in self._events:
+            if other.callbacks and self._check in other.callbacks:
+                other.callbacks.remove(self._check)
+        if event._ok:
+            self._value = {other: other._value for other in self._events
+                           if other.callbacks is None}
+
+
+class Store:
+    """An unbounded first-in first-out store of items (see simpy.Store).
+
+    items -- list of the items in the store
+    """
+    def __init__(self, env):
+        self._env = env
+        self.items = []
+        self.get_queue = []
+
+    def put(self, item):
+        """Add item and return an (already triggered) event."""
+        event = Event(self._env)
+        event.callbacks.append(self._trigger_get)
+        self.items.append(item)
+        event._ok = True
+        event._value = None
+        self._env.schedule(event)
+        return event
+
+    def get(self):
+        """Return an event triggered with the first item, once there is
+        one."""
+        event = Event(self._env)
+        self.get_queue.append(event)
+        self._trigger_get(None)
+        return event
+
+    def _trigger_get(self, put_event):
+        """Hand the first item to the first pending get, if any."""
+        if self.get_queue and self.items:
+            self.get_queue.pop(0).succeed(self.items.pop(0))
+
+
+def new_store(env):
+    """Return an unbounded store for env, of its engine (a kernel.Store for
+    a kernel.Environment, a simpy.Store otherwise)."""
+    if isinstance(env, Environment):
+        return Store(env)
+    return simpy.Store(env)
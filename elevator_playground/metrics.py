@@ -0,0 +1,251 @@
+"""Streaming performance metrics for the elevator simulation.
+
+Calls report their own lifecycle (generation, pick-up, completion) to a
+CallMetrics instance, which keeps running statistics in constant memory, so
+long simulations need not retain every call to compute their results.
+"""
+
+
+from collections import defaultdict
+
+
+class RunningStat:
+    """Running count, mean, variance, minimum and maximum of a series."""
+    def __init__(self):
+        """Create an empty running statistic.
+
+        count -- number of observations added
+        mean  -- mean of observations added (None if there are none)
+        min   -- smallest observation added (None if there are none)
+        max   -- largest observation added (None if there are none)
+        """
+        self.count = 0
+        self.mean = None
+        self.min = None
+        self.max = None
+        self._m2 = 0.0
+
+    def add(self, x):
+        """Add a single observation (Welford's algorithm)."""
+        self.count += 1
+        if self.count == 1:
+            self.mean = float(x)
+            self.min = x
+            self.max = x
+            return
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+
+    @property
+    def total(self):
+        """Return the sum of observations added."""
+        return self.mean * self.count if self.count else 0
+
+    @property
+    def variance(self):
+        """Return the sample variance (None if fewer than 2 observations)."""
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+
+class P2Quantile:
+    """Streaming estimate of a single quantile with the P-square algorithm.
+
+    Keeps five markers whose heights approximate the minimum, p/2-, p-,
+    (1+p)/2-quantiles and maximum of the observations (Jain & Chlamtac,
+    1985). Uses constant memory and time per observation. Exact while fewer
+    than five observations have been added.
+    """
+    def __init__(self, p):
+        """Create an estimator of the p-quantile (0 < p < 1)."""
+        if not 0 < p < 1:
+            raise ValueError("Quantile must lie strictly between 0 and 1.")
+        self.p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """Add a single observation."""
+        q = self._heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1
+                    or d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        """Return the piecewise-parabolic prediction for marker i."""
+        q = self._heights
+        n = self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        """Return the current estimate (None if there are no observations)."""
+        q = self._heights
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[int(round(self.p * (len(q) - 1)))]
+        return q[2]
+
+
+class SeriesStats:
+    """Running statistic together with streaming quantile estimates."""
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self.stat = RunningStat()
+        self.quantiles = {p: P2Quantile(p) for p in self.QUANTILES}
+
+    def add(self, x):
+        """Add a single observation."""
+        self.stat.add(x)
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    def quantile(self, p):
+        """Return the estimate of the p-quantile, one of QUANTILES."""
+        return self.quantiles[p].value()
+
+
+class CallMetrics:
+    """Accumulate service metrics of calls as they progress.
+
+    Calls hold a reference to a CallMetrics instance (their observer) and
+    report to it when they are generated, picked up and completed. Wait and
+    process times are accounted for once a call is completed.
+
+    Metrics may be nested: every call reported to a CallMetrics with a
+    parent is reported to the parent as well (e.g. the metrics of one
+    elevator bank to those of its whole site).
+    """
+    def __init__(self, parent=None):
+        """Create an empty accumulator.
+
+        parent -- CallMetrics instance that every call is also reported to,
+                  or None
+
+        generated           -- number of calls generated
+        picked up           -- number of calls picked up
+        pickup wait         -- RunningStat of wait times of calls picked
+                               up (completed or not)
+        completed           -- number of calls completed
+        wait                -- SeriesStats of wait times of completed calls
+        process             -- SeriesStats of process times of completed
+                               calls
+        wait by elevator    -- dictionary mapping elevator id to
+                               RunningStat of wait times
+        process by elevator -- dictionary mapping elevator id to
+                               RunningStat of process times
+        wait by floor       -- dictionary mapping source floor to
+                               RunningStat of wait times
+        """
+        self.generated = 0
+        self.picked_up = 0
+        self.completed = 0
+        self.pickup_wait = RunningStat()
+        self.wait = SeriesStats()
+        self.process = SeriesStats()
+        self.wait_by_elevator = defaultdict(RunningStat)
+        self.process_by_elevator = defaultdict(RunningStat)
+        self.wait_by_floor = defaultdict(RunningStat)
+        self.parent = parent
+
+    def on_generated(self, call):
+        """Account for a newly generated call."""
+        self.generated += 1
+        if self.parent is not None:
+            self.parent.on_generated(call)
+
+    def on_pickup(self, call):
+        """Account for a call that has just been picked up."""
+        self.picked_up += 1
+        self.pickup_wait.add(call.wait_time)
+        if self.parent is not None:
+            self.parent.on_pickup(call)
+
+    def on_completion(self, call):
+        """Account for a call that has just been completed."""
+        self.completed += 1
+        self.wait.add(call.wait_time)
+        self.process.add(call.process_time)
+        self.wait_by_elevator[call.elevator_id].add(call.wait_time)
+        self.process_by_elevator[call.elevator_id].add(call.process_time)
+        self.wait_by_floor[call.source].add(call.wait_time)
+        if self.parent is not None:
+            self.parent.on_completion(call)
+
+    def summary(self):
+        """Return the accumulated metrics as a flat dictionary.
+
+        Times are in simulation time units. Statistics of wait and process
+        times are None if no call has been completed.
+        """
+        results = {
+            "generated": self.generated,
+            "completed": self.completed,
+        }
+        for name, series in (("wait", self.wait), ("process", self.process)):
+            results[f"avg_{name}"] = series.stat.mean
+            results[f"max_{name}"] = series.stat.max
+            for p in SeriesStats.QUANTILES:
+                results[f"p{round(p * 100)}_{name}"] = series.quantile(p)
+        return results
+
+
+class ChainedObserver:
+    """Observer of calls passing every report on to a parent observer.
+
+    Observers inserted in a chain of metrics (see CallMetrics.parent), e.g.
+    to record calls for a session's exporter, subclass it and override the
+    reports they act on, calling the base method to pass them on.
+    """
+    def __init__(self, parent=None):
+        """Create an observer reporting to parent (None to end the chain)."""
+        self.parent = parent
+
+    def on_generated(self, call):
+        if self.parent is not None:
+            self.parent.on_generated(call)
+
+    def on_pickup(self, call):
+        if self.parent is not None:
+            self.parent.on_pickup(call)
+
+    def on_completion(self, call):
+        if self.parent is not None:
+            self.parent.on_completion(call)
@@ -0,0 +1,242 @@
+"""Live monitoring of long sessions, by periodic snapshots of their progress.
+
+A LiveMonitor given to a session (Session(building, runtime,
+monitor=LiveMonitor([JsonLinesSink("progress.jsonl")]))) has the session
+advance in intervals of simulation time, and publishes after each interval,
+and once more when the session ends, a snapshot holding:
+
+time           -- simulation time (in-simulation seconds)
+wall time      -- wall time since the session started (seconds)
+events         -- number of simulation events processed so far (since the
+                  monitor was attached)
+events per sec -- events processed per second of wall time, over the
+                  last interval
+generated      -- number of calls generated so far
+completed      -- number of calls completed so far
+unassigned     -- number of calls waiting to be assigned to an elevator
+elevators      -- list, for every elevator, of its bank (index of the
+                  building in the session), id, floor, number of pickups
+                  pending (waiting) and number of passengers (load)
+recent         -- number of calls completed during the last interval
+p50 wait       -- median wait time of those calls (seconds, None if none)
+p95 wait       -- 95th percentile of their wait times
+max wait       -- longest of their wait times
+final          -- True for the snapshot published when the session ends
+
+A sink is any object with two methods:
+
+    publish(snapshot)   -- do something with a snapshot (a dictionary);
+                           return True to stop the session early
+    close()             -- release any resources held by the sink
+
+Sinks are given snapshots in order. Monitoring does not change the course
+of the simulation.
+"""
+
+
+import json
+import socket
+import time
+
+from elevator_playground.metrics import ChainedObserver
+from elevator_playground.profiling import EventCounter
+from elevator_playground.utils import UP, DOWN
+
+
+class LiveMonitor:
+    """Publish snapshots of a session's progress to sinks.
+
+    The session attaches the monitor when it starts running, publishes a
+    snapshot every interval of simulation time, and detaches the monitor,
+    publishing a final snapshot and closing the sinks, when it is done.
+    """
+    def __init__(self, sinks, interval=3000):
+        """Create a monitor.
+
+        sinks    -- list of sinks receiving the snapshots
+        interval -- simulation time* between snapshots
+
+        Attributes:
+        stop requested -- True once a sink has asked for the session to stop
+
+        (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+        """
+        if interval <= 0:
+            raise MonitorError("Interval must be positive.")
+        self.sinks = list(sinks)
+        self.interval = interval
+        self.stop_requested = False
+        self._env = None
+        self._buildings = []
+        self._metrics = None
+        self._recent = []
+        self._started = None
+        self._last_wall = None
+        self._last_events = 0
+        self._counter = None
+
+    def attach(self, env, buildings, metrics):
+        """Start monitoring buildings, running on env, with metrics holding
+        the results of the session."""
+        if self._env is not None:
+            raise MonitorError("Monitor is already attached.")
+        self._env = env
+        self._buildings = list(buildings)
+        self._metrics = metrics
+        for building in self._buildings:
+            building.metrics.parent = _WaitRecorder(self._recent,
+                                                    building.metrics.parent)
+        self._counter = EventCounter()
+        self._counter.attach(env)
+        self._started = self._last_wall = time.perf_counter()
+        self._last_events = 0
+
+    def detach(self):
+        """Publish a final snapshot, stop monitoring and close the sinks."""
+        if self._env is None:
+            return
+        try:
+            self.publish(final=True)
+        finally:
+            for building in self._buildings:
+                building.metrics.parent = building.metrics.parent.parent
+            self._counter.detach()
+            self._env = None
+            self._buildings = []
+            for sink in self.sinks:
+                sink.close()
+
+    def publish(self, final=False):
+        """Publish a snapshot of the current progress to every sink."""
+        snapshot = self.snapshot(final)
+        for sink in self.sinks:
+            if sink.publish(snapshot):
+                self.stop_requested = True
+
+    def snapshot(self, final=False):
+        """Return a snapshot of the current progress, starting a new interval
+        for the rates and recent wait times."""
+        env = self._env
+        now = time.perf_counter()
+        events = self._counter.processed
+        elapsed = now - self._last_wall
+        waits = sorted(self._recent)
+        elevators = []
+        for bank, building in enumerate(self._buildings):
+            for elevator in building.elevators:
+                elevators.append({"bank": bank, "elevator": elevator.id,
+                                  "floor": elevator.floor,
+                                  "waiting": _pending_pickups(elevator),
+                                  "load": elevator.curr_capacity})
+        snapshot = {
+            "time": env.now / 10,
+            "wall_time": now - self._started,
+            "events": events,
+            "events_per_sec": ((events - self._last_events) / elapsed
+                               if elapsed > 0 else None),
+            "generated": self._metrics.generated,
+            "completed": self._metrics.completed,
+            "unassigned": sum(len(building.call_queue.items)
+                              for building in self._buildings),
+            "elevators": elevators,
+            "recent": len(waits),
+            "p50_wait": _quantile(waits, 0.5),
+            "p95_wait": _quantile(waits, 0.95),
+            "max_wait": waits[-1] / 10 if waits else None,
+            "final": final,
+        }
+        self._recent.clear()
+        self._last_wall = now
+        self._last_events = events
+        return snapshot
+
+
+class CallbackSink:
+    """Hand snapshots to a function, which may return True to stop the
+    session (e.g. once its wait times show the configuration is hopeless)."""
+    def __init__(self, callback):
+        """Create a sink calling callback(snapshot) for every snapshot."""
+        self.callback = callback
+
+    def publish(self, snapshot):
+        return self.callback(snapshot)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Append snapshots to a file as JSON lines, flushed as they come, so
+    that the file can be followed (e.g. with tail -f) during the session."""
+    def __init__(self, path):
+        """Create a sink appending to the file at path."""
+        self._file = open(path, "a")
+
+    def publish(self, snapshot):
+        self._file.write(json.dumps(snapshot) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SocketSink:
+    """Send snapshots as JSON lines over a stream socket, e.g. to a local
+    dashboard listening for them."""
+    def __init__(self, address, timeout=5.0):
+        """Create a sink connected to address.
+
+        address -- (host, port) of a TCP server, or path of a Unix domain
+                   socket
+        timeout -- seconds to wait for the connection and for each send
+        """
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(address)
+        else:
+            self._socket = socket.create_connection(address, timeout)
+
+    def publish(self, snapshot):
+        self._socket.sendall((json.dumps(snapshot) + "\n").encode())
+
+    def close(self):
+        self._socket.close()
+
+
+class _WaitRecorder(ChainedObserver):
+    """Observer of a building's calls (see metrics.CallMetrics.parent)
+    recording the wait times of completed calls."""
+    def __init__(self, waits, parent):
+        super().__init__(parent)
+        self.waits = waits
+
+    def on_completion(self, call):
+        self.waits.append(call.wait_time)
+        super().on_completion(call)
+
+
+def _pending_pickups(elevator):
+    """Return the number of pickups assigned to elevator but not made."""
+    manager = elevator.call_queue
+    pending = len(elevator.call_pipe.items)
+    for direction in (UP, DOWN):
+        for pickups in (manager.get_reachable_pickups(direction),
+                        manager.get_unreachable_pickups(direction)):
+            pending += sum(len(calls) for calls in pickups.values())
+    return pending
+
+
+def _quantile(values, p):
+    """Return the p-quantile of sorted values in in-simulation seconds, or
+    None if there are none."""
+    if not values:
+        return None
+    return values[min(int(p * len(values)), len(values) - 1)] / 10
+
+
+# -- Custom Errors --
+class MonitorError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,143 @@
+"""Parking policies: where idle elevators wait for their next call.
+
+A parking policy is any object with two methods:
+
+    observe(call)                       -- account for a newly generated call
+    parking_floor(building, elevator)   -- return the floor elevator should
+                                           wait at, or None to stay put
+
+A building created with a parking policy sends every idle elevator to the
+floor the policy chooses, once the elevator has been idle for its parking
+delay (see Elevator.parking_delay), and asks again every time the delay
+elapses while the elevator stays idle. A parking trip is cut short at the
+next floor as soon as the elevator is assigned a call. Floors are clamped to
+the elevator's service range.
+
+Policies may keep state (e.g. recent demand), so every building needs its
+own policy instance.
+"""
+
+
+from collections import deque
+
+
+class LobbyParking:
+    """Return idle elevators to the lobby (or any other fixed floor)."""
+    def __init__(self, floor=1):
+        """Create a policy parking every idle elevator at floor."""
+        self.floor = floor
+
+    def observe(self, call):
+        pass
+
+    def parking_floor(self, building, elevator):
+        return self.floor
+
+
+class ZoneParking:
+    """Park idle elevators at the centroids of evenly sized zones.
+
+    The service range shared by a group of elevators is split into as many
+    zones of consecutive floors as there are elevators in the group, and
+    the i-th elevator of the group parks at the middle floor of the i-th
+    zone.
+    """
+    def observe(self, call):
+        pass
+
+    def parking_floor(self, building, elevator):
+        peers = _peers(building, elevator)
+        lower, upper = elevator.lower_bound, elevator.upper_bound
+        zone_size = (upper - lower + 1) / len(peers)
+        return lower + int((peers.index(elevator) + 0.5) * zone_size)
+
+
+class PredictiveParking:
+    """Park idle elevators where calls are expected, from recent demand.
+
+    The source floors of the calls generated during the last window of time
+    estimate where the next calls will come from. The demand on the service
+    range of a group of elevators is split into as many segments of equal
+    demand as there are elevators in the group, and an idle elevator parks
+    at the demand median of the nearest segment not already covered by
+    another idle elevator of the group. Without recent calls, elevators park
+    as with ZoneParking.
+    """
+    def __init__(self, window=3000):
+        """Create a predictive policy.
+
+        window -- time* over which demand is estimated
+
+        (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+        """
+        self.window = window
+        self._recent = deque()
+        self._demand = {}
+        self._fallback = ZoneParking()
+
+    def observe(self, call):
+        self._recent.append((call.orig_time, call.source))
+        self._demand[call.source] = self._demand.get(call.source, 0) + 1
+        self._forget(call.orig_time)
+
+    def _forget(self, now):
+        """Drop calls generated more than window before now."""
+        recent = self._recent
+        demand = self._demand
+        while recent and recent[0][0] < now - self.window:
+            _, source = recent.popleft()
+            demand[source] -= 1
+            if not demand[source]:
+                del demand[source]
+
+    def parking_floor(self, building, elevator):
+        self._forget(building.env.now)
+        lower, upper = elevator.lower_bound, elevator.upper_bound
+        demand = sorted((floor, count) for floor, count in self._demand.items()
+                        if lower <= floor <= upper)
+        if not demand:
+            return self._fallback.parking_floor(building, elevator)
+        peers = _peers(building, elevator)
+        targets = _demand_medians(demand, len(peers))
+        covered = {_waiting_floor(peer) for peer in peers
+                   if peer is not elevator}
+        position = elevator.position()
+        candidates = [floor for floor in targets if floor not in covered]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda floor: abs(floor - position))
+
+
+def _peers(building, elevator):
+    """Return the elevators of building sharing elevator's service range."""
+    return [peer for peer in building.elevators
+            if peer.lower_bound == elevator.lower_bound
+            and peer.upper_bound == elevator.upper_bound]
+
+
+def _waiting_floor(elevator):
+    """Return the floor an idle elevator waits at (or is parking at), or None
+    if the elevator is busy."""
+    if elevator._activity == "park":
+        return elevator._trip_target
+    if elevator._activity == "idle":
+        return elevator.floor
+    return None
+
+
+def _demand_medians(demand, segments):
+    """Return the median floor of each of segments parts of equal demand.
+
+    demand -- list of (floor, count) pairs sorted by floor
+    """
+    total = sum(count for _, count in demand)
+    medians = []
+    seen = 0
+    i = 0
+    for k in range(segments):
+        middle = (k + 0.5) * total / segments
+        while seen + demand[i][1] < middle:
+            seen += demand[i][1]
+            i += 1
+        medians.append(demand[i][0])
+    return medians
@@ -0,0 +1,391 @@
+"""Opt-in profiling of simulation sessions.
+
+A Profiler attached to a session (Session(building, runtime,
+profiler=Profiler())) records, while the session runs:
+- the number of events each kind of process (e.g. Elevator._handle_calls,
+  Elevator._await_calls, Elevator._move_to) schedules and is resumed by
+- the wall time spent resuming each kind of process, also summed by
+  component (the class of the object running the process)
+- latency histograms of every CallManager operation of every elevator
+- the utilization of every elevator: the fractions of simulation time spent
+  moving, boarding (serving a stop) and idle
+
+Nothing is installed unless a profiler is given, so unprofiled sessions run
+at full speed. A profiler replaces the environment's step() and schedule()
+and wraps the call managers' operations for the duration of Session.run
+only, and removes itself afterwards (buildings cannot be captured in
+snapshots while profiled). Latencies of operations calling one another
+include each other.
+"""
+
+
+import json
+import time
+from heapq import heappop, heappush
+
+import simpy
+from elevator_playground import kernel
+
+
+# -- CallManager operations timed --
+CALL_MANAGER_OPS = ("add", "get_pickups", "get_dropoffs", "get_all_dropoffs",
+                    "get_reachable_pickups", "get_unreachable_pickups",
+                    "pickup_mask", "has_reachable_pickups", "next_pickup",
+                    "next_dropoff", "next_stop", "next_stop_from",
+                    "swap_reachable", "reject_reachable")
+# ----
+
+
+# -- Elevator activities by utilization state --
+UTILIZATION_STATES = ("moving", "boarding", "idle")
+ACTIVITY_STATES = {"move": "moving", "start": "moving", "park": "moving",
+                   "stop": "boarding", "idle": "idle", None: "idle"}
+# ----
+
+
+class LatencyHistogram:
+    """Histogram of durations in nanoseconds, in power-of-two buckets.
+
+    Bucket b counts durations d with 2**(b-1) <= d < 2**b (bucket 0 counts
+    durations of 0), so that quantiles are known within a factor of 2.
+    """
+    def __init__(self):
+        """Create an empty histogram.
+
+        buckets -- dictionary mapping bucket number to count
+        count   -- number of durations added
+        total   -- sum of durations added
+        max     -- longest duration added
+        """
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        """Add a duration in nanoseconds."""
+        bucket = ns.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def quantile(self, p):
+        """Return an upper bound of the p-quantile in nanoseconds (None if
+        the histogram is empty)."""
+        if not self.count:
+            return None
+        rank = p * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def summary(self):
+        """Return count, mean, median, 99th percentile and maximum, with
+        durations in microseconds."""
+        if not self.count:
+            return {"count": 0, "mean_us": None, "p50_us": None,
+                    "p99_us": None, "max_us": None}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000,
+            "p50_us": self.quantile(0.5) / 1000,
+            "p99_us": self.quantile(0.99) / 1000,
+            "max_us": self.max / 1000,
+        }
+
+
+class Profiler:
+    """Instrumentation of a session's environment, buildings and elevators.
+
+    The session attaches the profiler when it starts running and detaches it
+    when it is done; report() then returns what was recorded.
+    """
+    def __init__(self, path=None):
+        """Create a profiler.
+
+        path -- if given, file to which the report is written as JSON once
+                the session is done
+
+        Attributes:
+        scheduled      -- dictionary mapping process name to number of events
+                          scheduled while it was running
+        processed      -- dictionary mapping process name (or callback name,
+                          for events not resuming a process) to number of
+                          events delivered to it
+        process time   -- dictionary mapping process or callback name to wall
+                          time spent in it, in nanoseconds
+        op latency     -- dictionary mapping CallManager operation to
+                          LatencyHistogram
+        activity time  -- dictionary mapping (building label, elevator id) to
+                          a dictionary of simulation time per utilization
+                          state
+        wall time      -- wall time spent running, in seconds
+        """
+        self.path = path
+        self.scheduled = {}
+        self.processed = {}
+        self.process_time = {}
+        self.op_latency = {op: LatencyHistogram() for op in CALL_MANAGER_OPS}
+        self.activity_time = {}
+        self.wall_time = 0.0
+        self._env = None
+        self._elevators = []
+        self._last_now = None
+        self._started = None
+
+    def attach(self, env, buildings):
+        """Start instrumenting env and the elevators of buildings."""
+        if self._env is not None:
+            raise ProfilerError("Profiler is already attached.")
+        self._env = env
+        self._elevators = []
+        for i, building in enumerate(buildings):
+            label = building.name if building.name is not None else i
+            for elevator in building.elevators:
+                key = (label, elevator.id)
+                self.activity_time.setdefault(
+                    key, dict.fromkeys(UTILIZATION_STATES, 0))
+                self._elevators.append((elevator, self.activity_time[key]))
+                self._wrap_call_manager(elevator.call_queue)
+        # Instance attributes shadow the environment's methods, which
+        # Environment.run() and events look up on every call
+        env.step = self._step
+        env.schedule = self._schedule
+        self._last_now = env.now
+        self._started = time.perf_counter()
+
+    def detach(self):
+        """Stop instrumenting, restoring the original methods."""
+        env = self._env
+        if env is None:
+            return
+        self.wall_time += time.perf_counter() - self._started
+        self._account_activities(env.now)
+        del env.step
+        del env.schedule
+        for elevator, _ in self._elevators:
+            for op in CALL_MANAGER_OPS:
+                elevator.call_queue.__dict__.pop(op, None)
+        self._env = None
+        self._elevators = []
+        if self.path is not None:
+            with open(self.path, "w") as f:
+                json.dump(self.report(), f, indent=1)
+
+    def _wrap_call_manager(self, call_manager):
+        """Time every operation of call_manager."""
+        for op in CALL_MANAGER_OPS:
+            method = getattr(call_manager, op, None)
+            if method is not None:
+                setattr(call_manager, op,
+                        _timed(method, self.op_latency[op]))
+
+    def _schedule(self, event, priority=simpy.core.NORMAL, delay=0):
+        """Schedule event as Environment.schedule() does, counting it."""
+        env = self._env
+        name = _process_name(env._active_proc)
+        self.scheduled[name] = self.scheduled.get(name, 0) + 1
+        heappush(env._queue,
+                 (env._now + delay, priority, next(env._eid), event))
+
+    def _step(self):
+        """Process the next event as Environment.step() does, timing each of
+        its callbacks."""
+        env = self._env
+        try:
+            now, _, _, event = heappop(env._queue)
+        except IndexError:
+            raise simpy.core.EmptySchedule()
+        if now != self._last_now:
+            self._account_activities(now)
+        env._now = now
+        callbacks, event.callbacks = event.callbacks, None
+        for callback in callbacks:
+            owner = getattr(callback, "__self__", None)
+            if isinstance(owner, (simpy.events.Process, kernel.Process)):
+                name = _process_name(owner)
+            else:
+                name = getattr(callback, "__qualname__", repr(callback))
+            start = time.perf_counter_ns()
+            try:
+                callback(event)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                self.processed[name] = self.processed.get(name, 0) + 1
+                self.process_time[name] = (self.process_time.get(name, 0)
+                                           + elapsed)
+        if not event._ok and not hasattr(event, "_defused"):
+            exc = type(event._value)(*event._value.args)
+            exc.__cause__ = event._value
+            raise exc
+
+    def _account_activities(self, now):
+        """Credit the time elapsed until now to each elevator's activity."""
+        elapsed = now - self._last_now
+        for elevator, states in self._elevators:
+            states[ACTIVITY_STATES[elevator._activity]] += elapsed
+        self._last_now = now
+
+    def report(self):
+        """Return what was recorded as a dictionary.
+
+        events         -- dictionary mapping process or callback name to its
+                          numbers of events scheduled and processed and the
+                          wall time spent in it (seconds)
+        components     -- dictionary mapping component (class) to wall time
+                          spent in its processes (seconds)
+        call manager   -- dictionary mapping operation to its latency summary
+                          (see LatencyHistogram.summary), for operations
+                          that were called
+        utilization    -- list of dictionaries with the building, the
+                          elevator id and the fraction of time spent in
+                          each utilization state
+        wall time      -- wall time spent running (seconds)
+        """
+        events = {}
+        components = {}
+        for name in sorted(set(self.scheduled) | set(self.processed)):
+            seconds = self.process_time.get(name, 0) / 1e9
+            events[name] = {"scheduled": self.scheduled.get(name, 0),
+                            "processed": self.processed.get(name, 0),
+                            "wall_time": seconds}
+            component = name.split(".")[0]
+            components[component] = components.get(component, 0) + seconds
+        utilization = []
+        for (label, elevator_id), states in self.activity_time.items():
+            total = sum(states.values())
+            row = {"building": label, "elevator": elevator_id}
+            for state in UTILIZATION_STATES:
+                row[state] = states[state] / total if total else None
+            utilization.append(row)
+        return {
+            "events": events,
+            "components": components,
+            "call_manager": {op: histogram.summary()
+                             for op, histogram in self.op_latency.items()
+                             if histogram.count},
+            "utilization": utilization,
+            "wall_time": self.wall_time,
+        }
+
+    def format_report(self):
+        """Return the report as human-readable text."""
+        report = self.report()
+        lines = [f"Wall time = {report['wall_time']:.3f} s", "",
+                 "Events (scheduled / processed / wall time):"]
+        for name, counts in report["events"].items():
+            lines.append(f"  {name:40} {counts['scheduled']:>10} "
+                         f"{counts['processed']:>10} "
+                         f"{counts['wall_time']:>9.3f} s")
+        lines.append("Wall time by component:")
+        for component, seconds in report["components"].items():
+            lines.append(f"  {component:40} {seconds:>9.3f} s")
+        lines.append("CallManager operations (count / mean / p50 / p99 / "
+                     "max, us):")
+        for op, latency in report["call_manager"].items():
+            lines.append(f"  {op:24} {latency['count']:>10} "
+                         f"{latency['mean_us']:>8.2f} "
+                         f"{latency['p50_us']:>8.2f} "
+                         f"{latency['p99_us']:>8.2f} "
+                         f"{latency['max_us']:>8.2f}")
+        lines.append("Elevator utilization (moving / boarding / idle):")
+        for row in report["utilization"]:
+            fractions = " ".join(_percent(row[state])
+                                 for state in UTILIZATION_STATES)
+            lines.append(f"  Bank {row['building']} elevator "
+                         f"{row['elevator']}: {fractions}")
+        return "\n".join(lines)
+
+
+class EventCounter:
+    """Count the events an environment processes.
+
+    Much lighter than a Profiler: only the environment's step() is
+    shadowed, by one calling it and counting the event, until detach().
+    """
+    def __init__(self):
+        """Create a counter.
+
+        processed -- number of events processed while attached
+        """
+        self.processed = 0
+        self._env = None
+        self._shadowed = None
+
+    def attach(self, env):
+        """Start counting the events env processes."""
+        if self._env is not None:
+            raise ProfilerError("Event counter is already attached.")
+        self._env = env
+        # Keep any instrumentation installed before (e.g. a profiler's)
+        self._shadowed = env.__dict__.get("step")
+        step = env.step
+
+        def counted_step():
+            step()
+            self.processed += 1
+        env.step = counted_step
+
+    def detach(self):
+        """Stop counting, restoring the environment's previous step()."""
+        env = self._env
+        if env is None:
+            return
+        if self._shadowed is None:
+            del env.step
+        else:
+            env.step = self._shadowed
+        self._env = None
+        self._shadowed = None
+
+
+def _timed(method, histogram):
+    """Return method wrapped to add the latency of each call to
+    histogram."""
+    clock = time.perf_counter_ns
+
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.add(clock() - start)
+    return timed
+
+
+def _process_name(process):
+    """Return the name of the generator function of process, or
+    '<no process>' outside of any process (e.g. in resource callbacks).
+
+    Methods are named after the class of the object running them rather
+    than the class defining them, so that an EstimatedTimeOfArrivalBuilding
+    running the _assign_calls() it inherits from BasicBuilding is reported
+    as 'EstimatedTimeOfArrivalBuilding._assign_calls'.
+    """
+    if process is None:
+        return "<no process>"
+    generator = process._generator
+    frame = generator.gi_frame
+    owner = frame.f_locals.get("self") if frame is not None else None
+    if owner is None:
+        return generator.__qualname__
+    return f"{type(owner).__name__}.{generator.__name__}"
+
+
+def _percent(fraction):
+    """Format a fraction as a percentage, or 'n/a' if None."""
+    if fraction is None:
+        return "n/a"
+    return f"{fraction:6.1%}"
+
+
+# -- Custom Errors --
+class ProfilerError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
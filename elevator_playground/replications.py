@@ -0,0 +1,126 @@
+"""Independent replications of a configuration, with confidence intervals.
+
+A single session yields one sample of each metric, from one seed. replicate()
+simulates a configuration (as in the sweeps module) once per seed, in
+parallel across a process pool, and estimates every metric by its mean over
+the replications, with a Student t confidence interval.
+
+compare() replicates several dispatchers with common random numbers: every
+dispatcher is simulated with the same seeds, hence with the same calls
+(traffic sources draw from a random stream of their own, see
+traffic.PoissonTraffic; this does not hold for the 'default' traffic, drawn
+from the building's stream shared with random dispatching). Differences
+between dispatchers are estimated from paired replications, which cancels
+out most of the variance due to traffic, so that fewer replications tell
+dispatchers apart than with independent runs.
+"""
+
+
+from elevator_playground import sweeps
+from elevator_playground.intervals import confidence_interval
+
+
+# Keys of result rows that are not metrics: configuration, run bookkeeping
+# and the adaptive run length's (see convergence.AdaptiveRunLength.summary)
+NON_METRIC_KEYS = frozenset(sweeps.CONFIG_KEYS
+                            + ("engine", "precision", "wall_time")
+                            + ("warmup", "simulated", "batches", "converged"))
+
+
+def replicate(config, replications=10, confidence=0.95, processes=None):
+    """Simulate config with replications seeds and return the estimates.
+
+    config       -- sweep configuration (see sweeps); its seed is the first
+                    of the consecutive seeds used
+    replications -- number of independent replications
+    confidence   -- confidence level of the intervals (see
+                    intervals.T_TABLE)
+    processes    -- number of worker processes (defaults to the CPU count)
+
+    The result is a dictionary with:
+    seeds   -- list of the seeds simulated
+    metrics -- dictionary mapping each session metric to its estimate (see
+               intervals.confidence_interval)
+    rows    -- list of the result rows of the replications, in seed order
+    """
+    rows = _run(_replica_configs(config, replications), processes)
+    return _estimates(rows, confidence)
+
+
+def compare(config, dispatchers, replications=10, confidence=0.95,
+            processes=None):
+    """Replicate config with every dispatcher, using common random numbers,
+    and return the estimates and the paired differences.
+
+    dispatchers -- list of dispatcher names (see sweeps.DISPATCHERS), the
+                   first of which is the baseline compared against
+
+    Other arguments are as for replicate(). The result is a dictionary with:
+    dispatchers -- dictionary mapping each dispatcher to its estimates (as
+                   returned by replicate())
+    differences -- dictionary mapping each dispatcher but the baseline to a
+                   dictionary mapping each metric to the estimate of its
+                   difference with the baseline's (dispatcher - baseline)
+    """
+    if len(dispatchers) < 2:
+        raise ReplicationError("Comparison needs at least two dispatchers.")
+    configs = [replica for dispatcher in dispatchers
+               for replica in _replica_configs(dict(config,
+                                                    dispatcher=dispatcher),
+                                               replications)]
+    rows = _run(configs, processes)
+    results = {dispatcher: _estimates([row for row in rows
+                                       if row["dispatcher"] == dispatcher],
+                                      confidence)
+               for dispatcher in dispatchers}
+    baseline = results[dispatchers[0]]
+    differences = {}
+    for dispatcher in dispatchers[1:]:
+        differences[dispatcher] = {
+            metric: confidence_interval(
+                [row[metric] - base[metric]
+                 for row, base in zip(results[dispatcher]["rows"],
+                                      baseline["rows"])
+                 if row[metric] is not None and base[metric] is not None],
+                confidence)
+            for metric in baseline["metrics"]
+        }
+    return {"dispatchers": results, "differences": differences}
+
+
+def _replica_configs(config, replications):
+    """Return the configurations of replications consecutive seeds."""
+    if replications < 1:
+        raise ReplicationError("At least one replication is needed.")
+    return [dict(config, seed=config["seed"] + i)
+            for i in range(replications)]
+
+
+def _run(configs, processes):
+    """Simulate configs across a process pool and return their rows, in the
+    order of configs."""
+    rows = {}
+    for row in sweeps.sweep(configs, processes):
+        rows[(row["dispatcher"], row["seed"])] = row
+    return [rows[(config["dispatcher"], config["seed"])]
+            for config in configs]
+
+
+def _estimates(rows, confidence):
+    """Return the seeds, metric estimates and rows of replications."""
+    metrics = [key for key in rows[0] if key not in NON_METRIC_KEYS]
+    return {
+        "seeds": [row["seed"] for row in rows],
+        "metrics": {metric: confidence_interval(
+                        [row[metric] for row in rows
+                         if row[metric] is not None], confidence)
+                    for metric in metrics},
+        "rows": rows,
+    }
+
+
+# -- Custom Errors --
+class ReplicationError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
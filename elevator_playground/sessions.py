@@ -1,46 +1,237 @@
+import math
+
+from elevator_playground.metrics import CallMetrics
+from elevator_playground.tracing import NullTracer
+
+
+# -- Results that are counts rather than times --
+COUNT_KEYS = frozenset(("generated", "completed", "batches", "converged",
+                        "steady_completed"))
+# ----
+
+
 class Session:
     """A wrapper for the SimPy library for simulation execution.
 
     A session runs a simulation for a given building containing elevators
     and outputs the corresponding results.
+
+    A session may also run several buildings at once, e.g. the elevator
+    banks of a whole site, on one shared simpy.Environment (pass it to each
+    building as env, along with a distinct seed so that banks draw
+    independent random streams). Results are then given for the site as a
+    whole and for every bank.
+
+    A session runs on the environment of its buildings: buildings created
+    with a kernel.Environment run on the lightweight kernel rather than on
+    SimPy, somewhat faster and with identical results.
+
+    Given a profiling.Profiler, a session also records where simulation and
+    wall time are spent while it runs, and reports it at the end. Given an
+    exports.ResultsExporter, it writes the records of completed calls and
+    the timelines of elevators to files as it runs. Given a
+    convergence.AdaptiveRunLength, it runs only until the steady-state
+    average wait time is known to the rule's precision (runtime is then the
+    maximum), and also reports steady-state results, without the warm-up.
+    Given a monitoring.LiveMonitor, it publishes snapshots of its progress
+    at regular intervals while it runs.
     """
-    def __init__(self, building, runtime=36000):
+    def __init__(self, building, runtime=36000, tracer=None, profiler=None,
+                 exporter=None, adaptive=None, monitor=None):
         """Create a new simulation session for a given building.
 
-        env      -- simpy.Environment instance that runs the simulation
-        building -- buildings.Building subclass instance for conducting the
-                    simulation
-        runtime  -- total time* for running the simulation
+        env          -- simpy.Environment (or kernel.Environment) instance
+                        that runs the simulation
+        building     -- buildings.Building subclass instance for conducting
+                        the simulation, or a list of them sharing one
+                        environment
+        buildings    -- list of all buildings of the session
+        runtime      -- total time* for running the simulation
+        tracer       -- tracing.Tracer instance receiving simulation events
+                        of all buildings (events are discarded if not given)
+        site metrics -- metrics.CallMetrics instance that all buildings
+                        report to, if there are several
+        profiler     -- profiling.Profiler instance instrumenting the run
+                        (nothing is instrumented if not given)
+        exporter     -- exports.ResultsExporter instance writing call records
+                        and elevator timelines during the run, or None
+        adaptive     -- convergence.AdaptiveRunLength instance ending the
+                        run once results have converged, or None to run
+                        for the whole runtime
+        monitor      -- monitoring.LiveMonitor instance publishing progress
+                        snapshots during the run, or None
+
         (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
         """
-        self.env = building.env
-        self.building = building
+        if isinstance(building, (list, tuple)):
+            buildings = list(building)
+        else:
+            buildings = [building]
+        if not buildings:
+            raise SessionError("A session needs at least one building.")
+        self.env = buildings[0].env
+        if any(b.env is not self.env for b in buildings):
+            raise SessionError("Buildings of a session must share one "
+                               "environment.")
+        self.building = buildings[0]
+        self.buildings = buildings
         self.total_runtime = runtime
+        self.tracer = tracer if tracer is not None else NullTracer()
+        self.profiler = profiler
+        self.exporter = exporter
+        self.adaptive = adaptive
+        self.monitor = monitor
+        self.site_metrics = None
+        if len(buildings) > 1:
+            self.site_metrics = CallMetrics()
+        for b in buildings:
+            b.set_tracer(self.tracer)
+            if self.site_metrics is not None:
+                b.metrics.parent = self.site_metrics
+
+    def run(self, verbose=True):
+        """Run the session.
+
+        verbose -- print session banners and results (and the profiler's
+                   report, if profiled) if True
+        """
+        if verbose:
+            print("BEGINNING SESSION")
+            print("=================")
+        if self.profiler is not None:
+            self.profiler.attach(self.env, self.buildings)
+        if self.exporter is not None:
+            self.exporter.attach(self.buildings)
+        if self.adaptive is not None:
+            self.adaptive.attach(self.buildings, self.env.now)
+        if self.monitor is not None:
+            metrics = (self.site_metrics if self.site_metrics is not None
+                       else self.building.metrics)
+            self.monitor.attach(self.env, self.buildings, metrics)
+        try:
+            if self.adaptive is None and self.monitor is None:
+                self.env.run(until=self.total_runtime)
+            else:
+                self._run_in_chunks()
+        finally:
+            if self.monitor is not None:
+                self.monitor.detach()
+            if self.adaptive is not None:
+                self.adaptive.detach()
+            if self.exporter is not None:
+                self.exporter.detach()
+            if self.profiler is not None:
+                self.profiler.detach()
+            self.tracer.close()
+        if verbose:
+            print("=================")
+            print("ENDING SESSION")
+            print("\nRESULTS:")
+            self._disp_metrics()
+            if self.profiler is not None:
+                print("\nPROFILE:")
+                print(self.profiler.format_report())
 
-    def run(self):
-        """Run the session."""
-        print("BEGINNING SESSION")
-        print("=================")
-        self.env.run(until=self.total_runtime)
-        print("=================")
-        print("ENDING SESSION")
-        print("\nRESULTS:")
-        self._disp_metrics()
+    def _run_in_chunks(self):
+        """Run until the runtime is over, stopping at the end of every batch
+        of the adaptive run length and every interval of the monitor, and
+        earlier once the former has converged or the latter asks to stop."""
+        env = self.env
+        adaptive = self.adaptive
+        monitor = self.monitor
+        next_batch = next_report = math.inf
+        if adaptive is not None:
+            next_batch = env.now + adaptive.batch_length
+        if monitor is not None:
+            next_report = env.now + monitor.interval
+        while env.now < self.total_runtime:
+            env.run(until=min(next_batch, next_report, self.total_runtime))
+            if adaptive is not None and (env.now == next_batch
+                                         or env.now >= self.total_runtime):
+                adaptive.end_batch(env.now)
+                if adaptive.converged:
+                    break
+                next_batch = env.now + adaptive.batch_length
+            if monitor is not None and env.now == next_report:
+                if env.now >= self.total_runtime:
+                    # The final snapshot is published on detaching
+                    break
+                monitor.publish()
+                if monitor.stop_requested:
+                    break
+                next_report = env.now + monitor.interval
+
+    def metrics(self):
+        """Return simulation results as a dictionary.
+
+        Results are read from the building's streaming metrics (see
+        metrics.CallMetrics.summary), or from those of the whole site if the
+        session has several buildings. Times are converted to in-simulation
+        seconds, and are None if no call has been completed.
+        """
+        if self.site_metrics is not None:
+            return _in_seconds(self.site_metrics.summary())
+        return _in_seconds(self.building.metrics.summary())
+
+    def bank_metrics(self):
+        """Return a dictionary mapping each building's name (its index in the
+        session if it has none) to its results, as given by metrics().
+        """
+        return {b.name if b.name is not None else i:
+                _in_seconds(b.metrics.summary())
+                for i, b in enumerate(self.buildings)}
+
+    def steady_state_metrics(self):
+        """Return the steady-state results of an adaptive session (see
+        convergence.AdaptiveRunLength.summary), with times in in-simulation
+        seconds."""
+        if self.adaptive is None:
+            raise SessionError("Session has no adaptive run length.")
+        return _in_seconds(self.adaptive.summary())
 
     def _disp_metrics(self):
-        """Calculate and print simulation results."""
-        total_wait = sum(r.wait_time for r in self.building.call_history if
-                         r.done)
-        avg_wait = total_wait / sum(1 for _ in (r for r in self.building.call_history if r.done))
-        max_wait = max(r.wait_time for r in self.building.call_history if r.done)
-        completed_invocs = sum(1 for _ in (r for r in self.building.call_history if
-                                           r.done))
-        avg_pt = sum(r.process_time for r in self.building.call_history if
-                     r.done) / sum(1 for _ in (r for r in self.building.call_history if r.done))
-        max_pt = max(r.process_time for r in self.building.call_history if r.done)
-
-        print(f"Average wait time    = {avg_wait / 10} s")
-        print(f"Maximum wait time    = {max_wait / 10} s")
-        print(f"Completion rate      = {completed_invocs}/{len(self.building.call_history)}")
-        print(f"Average process time = {avg_pt / 10} s")
-        print(f"Maximum process time = {max_pt / 10} s")
+        """Print simulation results."""
+        results = self.metrics()
+        print(f"Average wait time    = {_seconds(results['avg_wait'])}")
+        print(f"Maximum wait time    = {_seconds(results['max_wait'])}")
+        print(f"95th pct. wait time  = {_seconds(results['p95_wait'])}")
+        print(f"Completion rate      = {results['completed']}/{results['generated']}")
+        print(f"Average process time = {_seconds(results['avg_process'])}")
+        print(f"Maximum process time = {_seconds(results['max_process'])}")
+        print(f"95th pct. proc. time = {_seconds(results['p95_process'])}")
+        if self.site_metrics is not None:
+            for name, bank in self.bank_metrics().items():
+                print(f"Bank {name}: average wait time "
+                      f"{_seconds(bank['avg_wait'])}, completion rate "
+                      f"{bank['completed']}/{bank['generated']}")
+        if self.adaptive is not None:
+            steady = self.steady_state_metrics()
+            status = "converged" if steady["converged"] else "not converged"
+            print(f"Simulated time       = "
+                  f"{_seconds(steady['simulated'])} ({status})")
+            print(f"Warm-up period       = {_seconds(steady['warmup'])}")
+            print(f"Steady avg. wait     = "
+                  f"{_seconds(steady['steady_avg_wait'])} +/- "
+                  f"{_seconds(steady['steady_avg_wait_hw'])}")
+
+
+def _in_seconds(results):
+    """Convert times of a metrics summary to in-simulation seconds."""
+    for key, value in results.items():
+        if key not in COUNT_KEYS and value is not None:
+            results[key] = value / 10
+    return results
+
+
+def _seconds(value):
+    """Format an in-simulation duration in seconds, or 'n/a' if None."""
+    if value is None:
+        return "n/a"
+    return f"{value} s"
+
+
+# -- Custom Errors --
+class SessionError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,136 @@
+"""Snapshots of running simulations, restorable into a fresh environment.
+
+A snapshot holds the complete state of a building at some simulation time:
+its elevators and their call managers, calls waiting to be assigned or
+handled, random number generator states, call id counters, metrics, call
+history and the position reached in its traffic source. Restoring it yields
+a new building, in a new environment (of the same engine, SimPy or the
+kernel) starting at the snapshot's time, that continues exactly as the
+original would have. A warmed-up state can so be captured once and forked
+into many what-if branches.
+
+SimPy processes cannot be serialized. Instead, every process of a building
+records the activity it is waiting on, and is restarted on restore from the
+activity it was in (see Building._resume and Elevator._resume_handling).
+Processes are restarted in the order their pending timeouts were due, so
+that simultaneous events keep their relative order.
+
+Snapshots are pickled, hence must only be loaded from trusted files.
+"""
+
+
+import pickle
+import zlib
+
+import simpy
+from elevator_playground import kernel
+from elevator_playground import tracing
+from elevator_playground import utils
+
+
+SNAPSHOT_MAGIC = b"ELVSNP01"
+
+
+def capture(building):
+    """Return a snapshot of building as bytes.
+
+    Events due at the current simulation time are processed first, so that
+    the building only waits on timeouts in the future. The building must
+    have its environment to itself: banks sharing one environment (see
+    sessions.Session) cannot be captured, as the events of the other banks
+    would be lost.
+    """
+    env = building.env
+    # Checked before processing any event, so that the simulation is left
+    # untouched
+    waits = building._waits()
+    for time, _, _, event in env._queue:
+        if time > env.now and event.callbacks and event not in waits:
+            raise SnapshotError("Cannot capture a building sharing its "
+                                "environment with other buildings (e.g. a "
+                                "bank of a multi-bank session).")
+    while env.peek() == env.now:
+        env.step()
+    waits = building._waits()
+    resumes = []
+    # Entries are (time, priority, event id, event), sorted as simpy would
+    # process them
+    for time, _, _, event in sorted(env._queue, key=lambda e: e[:3]):
+        if not event.callbacks:
+            # Abandoned, e.g. the timeout of an intercepted trip
+            continue
+        if event not in waits:
+            raise SnapshotError(f"Cannot capture unknown event {event!r} "
+                                f"due at time {time}.")
+        resumes.append((waits[event], time))
+    payload = {
+        "now": env.now,
+        "engine": type(env),
+        "building": building,
+        "resumes": resumes,
+        "next_call_id": utils.id_gen.next_id,
+    }
+    return SNAPSHOT_MAGIC + zlib.compress(
+        pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+
+
+def restore(snapshot):
+    """Return a new building restored from a snapshot made by capture().
+
+    The building runs in a new environment, of the same engine as the
+    captured building's, starting at the time of the snapshot, and discards
+    its events until given a tracer.
+    """
+    if not snapshot.startswith(SNAPSHOT_MAGIC):
+        raise SnapshotError("Data is not an elevator playground snapshot.")
+    payload = pickle.loads(zlib.decompress(snapshot[len(SNAPSHOT_MAGIC):]))
+    # Calls created without an explicit id must not reuse captured ids
+    utils.id_gen.next_id = max(utils.id_gen.next_id, payload["next_call_id"])
+    building = payload["building"]
+    engine = payload.get("engine", simpy.Environment)
+    building._resume(engine(payload["now"]), payload["resumes"])
+    return building
+
+
+def save(building, path):
+    """Write a snapshot of building to the file at path."""
+    snapshot = capture(building)
+    with open(path, "wb") as f:
+        f.write(snapshot)
+
+
+def load(path):
+    """Return a new building restored from the snapshot file at path."""
+    with open(path, "rb") as f:
+        return restore(f.read())
+
+
+def detached_state(obj):
+    """Return the attributes of obj to pickle, without simulation objects.
+
+    Environments, events (including processes) and tracers are replaced
+    with None, and stores with the list of their items.
+    """
+    state = dict(obj.__dict__)
+    for name, value in state.items():
+        if isinstance(value, (simpy.Environment, simpy.events.Event,
+                              kernel.Environment, kernel.Event,
+                              tracing.Tracer)):
+            state[name] = None
+        elif isinstance(value, (simpy.Store, kernel.Store)):
+            state[name] = list(value.items)
+    return state
+
+
+def attached_store(env, items):
+    """Return a store of env holding items (see detached_state)."""
+    store = kernel.new_store(env)
+    store.items.extend(items)
+    return store
+
+
+# -- Custom Errors --
+class SnapshotError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
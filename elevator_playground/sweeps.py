@@ -0,0 +1,163 @@
+"""Parameter sweeps running many sessions across a pool of processes.
+
+A sweep is a list of configurations, each a dictionary with the keys
+
+    num_floors, num_elevators, runtime, dispatcher, traffic, rate, seed
+
+(see grid() for building one from lists of values). The traffic key names
+one of TRAFFIC_PATTERNS, whose arrival rate (per hour) is given by the rate
+key, or is 'trace:<path>' to replay a recorded trace. An optional engine
+key names one of ENGINES, the event loop to simulate on (SimPy unless
+given); the engines give identical results. An optional precision key runs
+the configuration adaptively (see convergence.AdaptiveRunLength): only until
+the steady-state average wait time is known within that relative precision,
+runtime being the maximum, with steady-state results added to its row.
+Every configuration is simulated in a worker process with a freshly built,
+seeded building, so configurations share neither random state nor call id
+counters. Result rows are yielded in completion order as soon as each
+configuration finishes.
+"""
+
+
+import itertools
+import multiprocessing
+import time
+
+import simpy
+from elevator_playground import buildings
+from elevator_playground import convergence
+from elevator_playground import kernel
+from elevator_playground import sessions
+from elevator_playground import traffic
+
+
+# -- Named building classes and traffic patterns usable in configurations --
+DISPATCHERS = {
+    "random": buildings.BasicBuilding,
+    "eta": buildings.EstimatedTimeOfArrivalBuilding,
+    "destination": buildings.DestinationDispatchBuilding,
+    "sector": buildings.BasicSectorBuilding,
+    "dynamic": buildings.DynamicLoadBalancingBuilding,
+}
+
+# None stands for the building's own generation of one call every 10 s
+TRAFFIC_PATTERNS = {
+    "default": None,
+    "uniform": traffic.UNIFORM,
+    "up_peak": traffic.UP_PEAK,
+    "down_peak": traffic.DOWN_PEAK,
+    "lunch": traffic.LUNCH,
+    "interfloor": traffic.INTERFLOOR,
+}
+
+TRACE_PREFIX = "trace:"
+
+ENGINES = {
+    "simpy": simpy.Environment,
+    "kernel": kernel.Environment,
+}
+# ----
+
+
+CONFIG_KEYS = ("num_floors", "num_elevators", "runtime", "dispatcher",
+               "traffic", "rate", "seed")
+
+
+def grid(num_floors, num_elevators, runtime, dispatcher=("random",),
+         traffic=("default",), rate=(360,), seed=(1,)):
+    """Return the list of configurations in the cartesian product of values.
+
+    Each argument is an iterable of values for the corresponding key.
+    """
+    configs = []
+    for values in itertools.product(num_floors, num_elevators, runtime,
+                                    dispatcher, traffic, rate, seed):
+        config = dict(zip(CONFIG_KEYS, values))
+        _validate(config)
+        configs.append(config)
+    return configs
+
+
+def _validate(config):
+    """Raise SweepConfigError if config cannot be simulated."""
+    missing = [key for key in CONFIG_KEYS if key not in config]
+    if missing:
+        raise SweepConfigError(f"Configuration is missing {missing}.")
+    if config["dispatcher"] not in DISPATCHERS:
+        raise SweepConfigError(f"Unknown dispatcher "
+                               f"'{config['dispatcher']}'.")
+    if (config["traffic"] not in TRAFFIC_PATTERNS
+            and not config["traffic"].startswith(TRACE_PREFIX)):
+        raise SweepConfigError(f"Unknown traffic pattern "
+                               f"'{config['traffic']}'.")
+    if config.get("engine", "simpy") not in ENGINES:
+        raise SweepConfigError(f"Unknown engine '{config['engine']}'.")
+    if config.get("precision", 1) <= 0:
+        raise SweepConfigError("Precision must be positive.")
+
+
+def make_building(config):
+    """Build a fresh, seeded building for the given configuration."""
+    building_cls = DISPATCHERS[config["dispatcher"]]
+    env = ENGINES[config.get("engine", "simpy")]()
+    return building_cls(config["num_floors"], config["num_elevators"],
+                        seed=config["seed"], traffic=make_traffic(config),
+                        env=env)
+
+
+def make_traffic(config):
+    """Return the traffic source for the given configuration."""
+    pattern = config["traffic"]
+    if pattern.startswith(TRACE_PREFIX):
+        return traffic.TraceReplay(pattern[len(TRACE_PREFIX):])
+    mix = TRAFFIC_PATTERNS[pattern]
+    if mix is None:
+        return None
+    return traffic.PoissonTraffic(config["rate"], mix)
+
+
+def run_config(config):
+    """Simulate a single configuration and return its result row.
+
+    The row holds the configuration, the session metrics (and steady-state
+    metrics, if run adaptively) and the wall time (in seconds) spent
+    simulating.
+    """
+    building = make_building(config)
+    adaptive = None
+    if "precision" in config:
+        adaptive = convergence.AdaptiveRunLength(config["precision"])
+    session = sessions.Session(building, config["runtime"],
+                               adaptive=adaptive)
+    start = time.perf_counter()
+    session.run(verbose=False)
+    row = dict(config)
+    row.update(session.metrics())
+    if adaptive is not None:
+        row.update(session.steady_state_metrics())
+    row["wall_time"] = time.perf_counter() - start
+    return row
+
+
+def sweep(configs, processes=None):
+    """Simulate all configurations in a process pool and yield result rows.
+
+    configs   -- iterable of configuration dictionaries
+    processes -- number of worker processes (defaults to the CPU count)
+
+    Rows are yielded in the order configurations finish, not the order they
+    were given.
+    """
+    configs = list(configs)
+    for config in configs:
+        _validate(config)
+    with multiprocessing.Pool(processes) as pool:
+        for row in pool.imap_unordered(run_config, configs):
+            yield row
+
+
+# -- Custom Errors --
+class SweepConfigError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
@@ -0,0 +1,129 @@
+"""Pluggable tracing of simulation events.
+
+Buildings and elevators report every state change (call generation, call
+assignment, movement, pick-ups and drop-offs) to a tracer. By default a
+NullTracer is installed, whose level is above every event level, so the
+hot path only pays for a single attribute comparison:
+
+    if self.tracer.level <= INFO:
+        self.tracer.emit(self.env.now, INFO, "pickup", elevator=self.id, ...)
+
+Event fields are only formatted when a tracer that accepts the event's level
+is installed, e.g. with Session(building, runtime, tracer=ConsoleTracer()).
+"""
+
+
+from abc import ABC, abstractmethod
+import gzip
+import json
+
+from elevator_playground.utils import print_status
+
+
+# -- Trace levels --
+DEBUG = 10
+INFO = 20
+OFF = 100
+# ----
+
+
+# -- Human-readable event descriptions --
+MESSAGES = {
+    "generate_start": "Building has started generating calls...",
+    "assign_start": "Building has started assigning calls...",
+    "generate": "[Generate] call {call}: floor {source} to {dest}",
+    "select": "[Select] call {call}: Elevator {elevator}",
+    "rebalance": "Building re-partitioned sectors to {sectors}",
+    "receive": "Elevator {elevator} received call {call} at floor {floor}",
+    "move": "Elevator {elevator} started moving {direction} to {target}",
+    "intercept": "Elevator {elevator} is stopping early at {target}",
+    "arrive": "Elevator {elevator} is now at floor {floor}",
+    "full": "Elevator {elevator} is full.",
+    "pickup": "(pick up) Elevator {elevator} at floor {floor}"
+              ", capacity now {load}",
+    "dropoff": "(drop off) Elevator {elevator} at floor {floor}"
+               ", capacity now {load}",
+}
+# ----
+
+
+class Tracer(ABC):
+    """Receive simulation events at or above a given level.
+
+    Subclasses override emit() to do something with each event. Callers are
+    expected to check the tracer's level before building an event, so emit()
+    is never invoked for filtered events.
+    """
+    def __init__(self, level=INFO):
+        """Create a tracer.
+
+        level -- minimum level (DEBUG or INFO) of events to be emitted
+        """
+        self.level = level
+
+    @abstractmethod
+    def emit(self, time, level, event, **fields):
+        """Record a single event that occurred at in-simulation time."""
+        pass
+
+    def close(self):
+        """Flush and release any resources held by the tracer."""
+        pass
+
+
+class NullTracer(Tracer):
+    """A tracer that discards everything. Installed by default."""
+    def __init__(self):
+        super().__init__(OFF)
+
+    def emit(self, time, level, event, **fields):
+        pass
+
+
+class ConsoleTracer(Tracer):
+    """Print events as human-readable status lines."""
+
+    def emit(self, time, level, event, **fields):
+        print_status(time, MESSAGES[event].format(**fields))
+
+
+class JSONLTracer(Tracer):
+    """Write events as JSON lines to a file, buffered in memory.
+
+    Each line is an object of the form
+        {"time": ..., "level": ..., "event": ..., <event fields>}
+    Paths ending in '.gz' are gzip-compressed.
+    """
+    def __init__(self, path, level=INFO, buffer_size=4096):
+        """Create a JSONL tracer.
+
+        path        -- file to write the event log to (truncated on open)
+        level       -- minimum level of events to be emitted
+        buffer_size -- number of events held in memory before writing
+        """
+        super().__init__(level)
+        if path.endswith(".gz"):
+            self._file = gzip.open(path, "wt")
+        else:
+            self._file = open(path, "w")
+        self._buffer = []
+        self._buffer_size = buffer_size
+
+    def emit(self, time, level, event, **fields):
+        fields["time"] = time
+        fields["level"] = level
+        fields["event"] = event
+        self._buffer.append(json.dumps(fields))
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered events to the file."""
+        if self._buffer:
+            self._file.write("\n".join(self._buffer))
+            self._file.write("\n")
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
@@ -0,0 +1,421 @@
+"""Sources of traffic (calls arriving over time) for buildings.
+
+A traffic source is any object with an arrivals(building) method returning
+an iterator of (time, source, dest) tuples in chronological order. A
+building created with a traffic source generates one call per tuple,
+exactly at its time (see Building._generate_calls_from). Iterators are
+consumed lazily, one arrival at a time, so sources may be arbitrarily long.
+The iterators of the sources below can be pickled part-way through, so that
+snapshots of a building capture the position reached in its traffic.
+
+Besides replaying recorded traces, the module offers stochastic traffic:
+PoissonTraffic generates Poisson arrivals (homogeneous, or with a
+piecewise-constant rate over the day) whose origin and destination floors
+follow a mix of incoming, outgoing and interfloor traffic (UP_PEAK,
+DOWN_PEAK, LUNCH, INTERFLOOR or a custom TrafficMix). Arrivals are sampled
+in batches from the building's traffic random number generator, so the
+same seed yields the same traffic whatever the building's dispatching.
+
+Times are in simulation time units (0.1 seconds).
+"""
+
+
+import bisect
+import csv
+from itertools import accumulate, repeat
+from math import log
+import mmap
+import struct
+
+
+HOUR = 36000
+
+
+# -- Binary trace format --
+# An 8-byte magic header followed by fixed-size little-endian records of
+# (time: float64, source: int32, dest: int32).
+TRACE_MAGIC = b"ELVTRC01"
+TRACE_RECORD = struct.Struct("<dii")
+# ----
+
+
+class TraceReplay:
+    """Replay recorded traffic from a CSV or binary trace file.
+
+    CSV traces hold one arrival per row as 'time,source,dest' (a header row
+    with these names is optional). Binary traces are written with
+    write_binary_trace() and are read through a memory map. Either way,
+    arrivals are read lazily, so traces need not fit in memory.
+    """
+    def __init__(self, path, file_format=None, chunk_size=65536):
+        """Create a replay of the trace at path.
+
+        path        -- trace file to replay
+        file_format -- 'csv' or 'binary' (inferred from the file's header
+                       if not given)
+        chunk_size  -- number of binary records decoded at a time
+        """
+        self.path = path
+        if file_format is None:
+            file_format = "binary" if _is_binary_trace(path) else "csv"
+        if file_format not in ("csv", "binary"):
+            raise TrafficError(f"Unknown trace format '{file_format}'.")
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+
+    def arrivals(self, building=None):
+        """Return an iterator of (time, source, dest) tuples from the trace."""
+        if self.file_format == "csv":
+            return read_csv_trace(self.path)
+        return read_binary_trace(self.path, self.chunk_size)
+
+
+def _is_binary_trace(path):
+    """Return True if the file at path starts with the binary trace magic."""
+    with open(path, "rb") as f:
+        return f.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+
+
+def read_csv_trace(path):
+    """Return an iterator of (time, source, dest) tuples from a CSV trace.
+
+    The file is closed once the trace is exhausted; to stop early, close the
+    iterator (or use it as a context manager).
+    """
+    return _CSVTraceReader(path)
+
+
+def read_binary_trace(path, chunk_size=65536):
+    """Return an iterator of (time, source, dest) tuples from a binary trace.
+
+    The file is memory-mapped and decoded chunk_size records at a time. It
+    is unmapped once the trace is exhausted; to stop early, close the
+    iterator (or use it as a context manager).
+    """
+    return _BinaryTraceReader(path, chunk_size)
+
+
+class _CSVTraceReader:
+    """Iterator over the arrivals of a CSV trace.
+
+    Only the number of rows read is pickled; the file is reopened and read
+    up to that row when iterating a restored reader (see snapshots).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.rows_read = 0
+        self._file = None
+        self._rows = None
+
+    def __getstate__(self):
+        return {"path": self.path, "rows_read": self.rows_read}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+        self.rows_read = state["rows_read"]
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __next__(self):
+        if self._rows is None:
+            self._file = open(self.path, newline="")
+            self._rows = csv.reader(self._file)
+            for _ in range(self.rows_read):
+                next(self._rows)
+        for row in self._rows:
+            self.rows_read += 1
+            if not row or row[0].strip() == "time":
+                continue
+            time, source, dest = row
+            return float(time), int(source), int(dest)
+        self.close()
+        self._rows = iter(())
+        raise StopIteration
+
+    def close(self):
+        """Close the file; iterating again reopens it where reading
+        stopped."""
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._rows = None
+
+
+class _BinaryTraceReader:
+    """Iterator over the arrivals of a binary trace.
+
+    Only the offset of the next record is pickled; the file is mapped again
+    when iterating a restored reader (see snapshots).
+    """
+    def __init__(self, path, chunk_size):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.offset = len(TRACE_MAGIC)
+        self._mm = None
+        self._records = iter(())
+
+    def __getstate__(self):
+        return {"path": self.path, "chunk_size": self.chunk_size,
+                "offset": self.offset}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["chunk_size"])
+        self.offset = state["offset"]
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __next__(self):
+        record = next(self._records, None)
+        if record is None:
+            record = self._next_chunk()
+        self.offset += TRACE_RECORD.size
+        return record
+
+    def _next_chunk(self):
+        """Decode the chunk starting at the offset and return its first
+        record."""
+        if self._mm is None:
+            self._open()
+        if self.offset >= len(self._mm):
+            self.close()
+            raise StopIteration
+        end = self.offset + self.chunk_size * TRACE_RECORD.size
+        self._records = TRACE_RECORD.iter_unpack(self._mm[self.offset:end])
+        return next(self._records)
+
+    def close(self):
+        """Unmap the file; iterating again maps it anew where reading
+        stopped."""
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = None
+        self._records = iter(())
+
+    def _open(self):
+        """Check the trace and map it into memory."""
+        with open(self.path, "rb") as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise TrafficError(f"'{self.path}' is not a binary trace.")
+            size = f.seek(0, 2)
+            if (size - len(TRACE_MAGIC)) % TRACE_RECORD.size:
+                raise TrafficError(f"'{self.path}' has a truncated record.")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_binary_trace(path, arrivals):
+    """Write (time, source, dest) tuples from an iterable to a binary trace.
+
+    Return the number of arrivals written.
+    """
+    count = 0
+    with open(path, "wb") as f:
+        f.write(TRACE_MAGIC)
+        for time, source, dest in arrivals:
+            f.write(TRACE_RECORD.pack(time, source, dest))
+            count += 1
+    return count
+
+
+def csv_to_binary_trace(csv_path, binary_path):
+    """Convert a CSV trace into a binary trace. Return number of arrivals."""
+    return write_binary_trace(binary_path, read_csv_trace(csv_path))
+
+
+class Uniform:
+    """Origin-destination weights giving every pair of floors equal weight."""
+
+    def matrix(self, num_floors):
+        """Return a dictionary mapping (source, dest) to a weight."""
+        return {(source, dest): 1
+                for source in range(1, num_floors + 1)
+                for dest in range(1, num_floors + 1) if source != dest}
+
+
+class TrafficMix:
+    """Origin-destination weights mixing the three components of traffic.
+
+    incoming   -- fraction of passengers travelling from the lobby to an
+                  upper floor
+    outgoing   -- fraction of passengers travelling from an upper floor to
+                  the lobby
+    interfloor -- fraction of passengers travelling between upper floors
+
+    Within each component, upper floors are weighted by their population
+    (equal unless specified).
+    """
+    def __init__(self, incoming, outgoing, interfloor, lobby=1,
+                 populations=None):
+        """Create a traffic mix.
+
+        incoming, outgoing, interfloor -- relative shares of each component
+        lobby       -- floor through which passengers enter and leave
+        populations -- dictionary mapping floor to its relative population
+                       (floors not given default to 1)
+        """
+        if min(incoming, outgoing, interfloor) < 0:
+            raise TrafficError("Traffic shares cannot be negative.")
+        if incoming + outgoing + interfloor <= 0:
+            raise TrafficError("Traffic shares cannot all be zero.")
+        self.incoming = incoming
+        self.outgoing = outgoing
+        self.interfloor = interfloor
+        self.lobby = lobby
+        self.populations = populations or {}
+
+    def matrix(self, num_floors):
+        """Return a dictionary mapping (source, dest) to a weight."""
+        if not 1 <= self.lobby <= num_floors:
+            raise TrafficError("Lobby is out of range.")
+        upper = [floor for floor in range(1, num_floors + 1)
+                 if floor != self.lobby]
+        weights = {floor: self.populations.get(floor, 1) for floor in upper}
+        total = sum(weights.values())
+        od = {}
+        for floor in upper:
+            share = weights[floor] / total
+            od[(self.lobby, floor)] = self.incoming * share
+            od[(floor, self.lobby)] = self.outgoing * share
+        pair_total = sum(weights[s] * weights[d]
+                         for s in upper for d in upper if s != d)
+        if pair_total:
+            for source in upper:
+                for dest in upper:
+                    if source != dest:
+                        od[(source, dest)] = (self.interfloor
+                                              * weights[source]
+                                              * weights[dest] / pair_total)
+        return {pair: weight for pair, weight in od.items() if weight > 0}
+
+
+# -- Typical traffic mixes --
+UNIFORM = Uniform()
+UP_PEAK = TrafficMix(incoming=0.85, outgoing=0.05, interfloor=0.10)
+DOWN_PEAK = TrafficMix(incoming=0.05, outgoing=0.85, interfloor=0.10)
+LUNCH = TrafficMix(incoming=0.40, outgoing=0.40, interfloor=0.20)
+INTERFLOOR = TrafficMix(incoming=0.10, outgoing=0.10, interfloor=0.80)
+# ----
+
+
+class PoissonTraffic:
+    """Poisson arrivals with origin and destination drawn from a traffic mix.
+
+    The arrival rate is either constant, or piecewise constant over time
+    (a non-homogeneous Poisson process, e.g. a daily profile). Arrivals are
+    sampled batch_size at a time: floors with a single weighted
+    random.choices() call over the origin-destination pairs, and arrival
+    times by transforming unit-rate exponential gaps through the cumulative
+    rate. The standard library has no batched exponential sampler, so gaps
+    still take one draw each.
+    """
+    def __init__(self, rate, mix=UNIFORM, batch_size=1024):
+        """Create a Poisson traffic source.
+
+        rate       -- arrivals per hour (36000 time units), or a list of
+                      (start time, arrivals per hour) steps starting at time
+                      0, the last rate holding indefinitely
+        mix        -- origin-destination weights (Uniform, TrafficMix, or
+                      any object with a matrix(num_floors) method)
+        batch_size -- number of arrivals sampled at a time
+        """
+        if isinstance(rate, (int, float)):
+            rate = [(0, rate)]
+        rate = sorted(rate)
+        if not rate or rate[0][0] != 0:
+            raise TrafficError("Rate profile must start at time 0.")
+        if any(r < 0 for _, r in rate):
+            raise TrafficError("Rates cannot be negative.")
+        self.rate = rate
+        self.mix = mix
+        self.batch_size = batch_size
+        # Cumulative expected arrivals at the start of each step
+        self._starts = [start for start, _ in rate]
+        self._per_unit = [r / HOUR for _, r in rate]
+        self._cumulative = [0.0]
+        for i in range(1, len(rate)):
+            self._cumulative.append(self._cumulative[-1]
+                                    + self._per_unit[i - 1]
+                                    * (self._starts[i] - self._starts[i - 1]))
+
+    def arrivals(self, building):
+        """Return an iterator of (time, source, dest) tuples."""
+        od = self.mix.matrix(building.num_floors)
+        if not od:
+            raise TrafficError("Traffic mix has no origin-destination pairs.")
+        return _PoissonArrivals(self, building.traffic_rng, list(od),
+                                list(accumulate(od.values())))
+
+    def _time_at(self, expected):
+        """Return the time by which given number of arrivals is expected.
+
+        Return None if the rate drops to zero for good before that.
+        """
+        i = bisect.bisect_right(self._cumulative, expected) - 1
+        if self._per_unit[i] == 0:
+            return None
+        return (self._starts[i]
+                + (expected - self._cumulative[i]) / self._per_unit[i])
+
+
+class _PoissonArrivals:
+    """Iterator over the arrivals of a PoissonTraffic source.
+
+    Its whole state lies in its attributes (including the random number
+    generator it draws from), so it can be pickled along with the building
+    it feeds (see snapshots).
+    """
+    def __init__(self, traffic, rng, pairs, cum_weights):
+        self.traffic = traffic
+        self.rng = rng
+        self.pairs = pairs
+        self.cum_weights = cum_weights
+        self.expected = 0.0
+        self.done = False
+        self._batch = []
+        self._index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the next arrival, sampling batch_size of them at a time."""
+        if self.done:
+            raise StopIteration
+        if self._index == len(self._batch):
+            batch_size = self.traffic.batch_size
+            # Same values as rng.expovariate(1), without a Python-level
+            # call per gap
+            uniform = self.rng.random
+            gaps = [-log(1.0 - uniform()) for _ in repeat(None, batch_size)]
+            floors = self.rng.choices(self.pairs, cum_weights=self.cum_weights,
+                                      k=batch_size)
+            self._batch = list(zip(gaps, floors))
+            self._index = 0
+        gap, (source, dest) = self._batch[self._index]
+        self._index += 1
+        self.expected += gap
+        time = self.traffic._time_at(self.expected)
+        if time is None:
+            self.done = True
+            raise StopIteration
+        return time, source, dest
+
+
+# -- Custom Errors --
+class TrafficError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+# ----
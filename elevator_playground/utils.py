@@ -1,7 +1,7 @@
 """Utilities for running the elevator simulation."""
 
 
-from random import sample
+import random
 
 
 # -- Outputting simulation state --
@@ -70,12 +70,29 @@ def to_string(direction):
 # ---- Calls ----
 
 # -- ID generator for Call class --
+class CallIdGenerator:
+    """An iterator sequentially yielding unique values.
+
+    Unlike a generator, it can be pickled along with its position (see
+    snapshots).
+
+    next id -- value to be yielded next
+    """
+    def __init__(self, start=1):
+        self.next_id = start
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        call_id = self.next_id
+        self.next_id += 1
+        return call_id
+
+
 def call_id_generator():
-    """A generator to sequentially yield a unique value."""
-    call_id = 1
-    while True:
-        yield call_id
-        call_id += 1
+    """Return an iterator sequentially yielding unique values from 1."""
+    return CallIdGenerator()
 
 
 id_gen = call_id_generator()
@@ -84,7 +101,11 @@ id_gen = call_id_generator()
 
 class Call:
     """An elevator call to go from one floor to another at a specific time."""
-    def __init__(self, source, destination, time):
+    __slots__ = ("id", "source", "dest", "direction", "orig_time",
+                 "wait_time", "process_time", "done", "elevator_id",
+                 "observer")
+
+    def __init__(self, source, destination, time, call_id=None):
         """Create a new call.
 
         id           -- unique number to identify a call
@@ -96,10 +117,17 @@ class Call:
         wait time    -- time* elapsed between initialization and pick-up
         process time -- time* elapsed between initialization and completion
         done         -- True if call has been completed, False otherwise
+        elevator id  -- id of the elevator the call was assigned to
+        observer     -- object notified when the call is picked up and
+                        completed (e.g. metrics.CallMetrics), or None
 
         (*Unit is 0.1 seconds. Example: 75 -> 7.5 in-simulation seconds)
+
+        The id is taken from the module-wide id generator unless call_id is
+        given (buildings pass ids from their own generator, so that several
+        buildings in one process do not share a counter).
         """
-        self.id = next(id_gen)
+        self.id = call_id if call_id is not None else next(id_gen)
         self.source = source
         self.dest = destination
         if self.dest - self.source > 0:
@@ -113,27 +141,37 @@ class Call:
         self.wait_time = None
         self.process_time = None
         self.done = False
+        self.elevator_id = None
+        self.observer = None
 
     def picked_up(self, pick_up_time):
         """Set the wait time according to when call was picked up."""
         self.wait_time = pick_up_time - self.orig_time
+        if self.observer is not None:
+            self.observer.on_pickup(self)
 
     def completed(self, completion_time):
         """Mark the call as completed and calculate the total process time."""
         self.done = True
         self.process_time = completion_time - self.orig_time
+        if self.observer is not None:
+            self.observer.on_completion(self)
 
 
-def rand_call(time, floor_upper_bound, floor_lower_bound=1):
+def rand_call(time, floor_upper_bound, floor_lower_bound=1, rng=random,
+              call_id=None, factory=Call):
     """Generate a random elevator call.
 
     The generated call is initialized at time "time", with the source floor
     and destination floors between the given upper and lower bound.
     The lower bound for the floors is set to 1 unless specified.
+    Floors are chosen uniformly; see the traffic module for other
+    distributions (up-peak, down-peak, lunch and interfloor traffic).
+    Floors are drawn from rng (a random.Random instance, or the random module
+    itself if not specified). The call is created with factory, which takes
+    the same arguments as Call (e.g. callstore.CallStore.new_call).
     """
-    # TODO: Make floor choice between upper and lower bound dependent on given distribution.
-    # TODO: (ex. uppeak/downpeak traffic, base floor congestion etc.).
-    source, dest = sample([i for i in range(floor_lower_bound, floor_upper_bound + 1)], 2)
-    return Call(source, dest, time)
+    source, dest = rng.sample(range(floor_lower_bound, floor_upper_bound + 1), 2)
+    return factory(source, dest, time, call_id)
 # --------
 
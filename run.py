@@ -1,20 +1,20 @@
 from elevator_playground import buildings
 from elevator_playground import sessions
-import random
+from elevator_playground import tracing
 
 RANDOM_SEED = 1
 
 
 def run_simulation():
     """Set up simulation parameters and run the simulation."""
-    random.seed(RANDOM_SEED)
-
     num_floors = 10
     num_elevators = 1
     total_runtime = 600
 
-    building = buildings.BasicBuilding(num_floors, num_elevators)
-    session = sessions.Session(building, total_runtime)
+    building = buildings.BasicBuilding(num_floors, num_elevators,
+                                       seed=RANDOM_SEED)
+    tracer = tracing.ConsoleTracer(tracing.INFO)
+    session = sessions.Session(building, total_runtime, tracer)
 
     session.run()
 
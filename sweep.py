@@ -0,0 +1,48 @@
+from elevator_playground import convergence, sweeps
+import csv
+import sys
+
+
+def run_sweep():
+    """Set up a grid of simulation parameters and sweep over it.
+
+    Result rows are written as CSV to stdout as soon as each configuration
+    finishes.
+    """
+    configs = sweeps.grid(num_floors=[10, 20],
+                          num_elevators=[1, 2, 4],
+                          runtime=[36000],
+                          dispatcher=["random", "eta"],
+                          traffic=["default", "up_peak", "lunch"],
+                          rate=[720],
+                          seed=[1, 2, 3])
+
+    writer = None
+    for row in sweeps.sweep(configs):
+        if writer is None:
+            writer = csv.DictWriter(sys.stdout, _fieldnames(configs, row),
+                                    restval="")
+            writer.writeheader()
+        writer.writerow(row)
+        sys.stdout.flush()
+
+
+def _fieldnames(configs, row):
+    """Return the CSV columns of rows like row, covering the keys of every
+    configuration and the steady-state results of adaptive ones.
+
+    Rows are written as they come, so the header must be known from the
+    first row; columns a row lacks are left empty.
+    """
+    fieldnames = list(row)
+    extra = [key for config in configs for key in config]
+    if any("precision" in config for config in configs):
+        extra.extend(convergence.SUMMARY_KEYS)
+    for key in extra:
+        if key not in fieldnames:
+            fieldnames.append(key)
+    return fieldnames
+
+
+if __name__ == '__main__':
+    run_sweep()
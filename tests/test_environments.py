@@ -0,0 +1,60 @@
+import unittest
+
+from elevator_playground.buildings import DispatchError
+from elevator_playground.environments import (DispatchEnvironment,
+                                              VectorDispatchEnvironment)
+from elevator_playground.parking import PredictiveParking
+from elevator_playground.traffic import PoissonTraffic
+
+
+class DispatchEnvironmentTest(unittest.TestCase):
+    def test_invalid_step_leaves_call_pending(self):
+        env = DispatchEnvironment(10, 3, horizon=6000)
+        env.reset(seed=1)
+        building = env.building
+        call = building.pending_call
+        decision = building.decision
+        # An elevator whose service range excludes the call's floors
+        other = 1 if call.source != 1 and call.dest != 1 else 10
+        building.elevators[2].set_service_range(other, other)
+        for action in (-1, 3, 2):
+            with self.assertRaises(DispatchError):
+                env.step(action)
+            self.assertIs(building.pending_call, call)
+            self.assertIs(building.decision, decision)
+            self.assertFalse(decision.triggered)
+        building.elevators[2].set_service_range(1, 10)
+        done = False
+        while not done:
+            observation, reward, done, info = env.step(0)
+            self.assertIsNot(building.pending_call, call)
+        self.assertTrue(building.call_assigner.is_alive)
+        self.assertGreater(building.metrics.completed, 0)
+
+    def test_resets_with_same_seed_give_identical_episodes(self):
+        env = DispatchEnvironment(10, 3, horizon=6000,
+                                  traffic=PoissonTraffic(60),
+                                  parking=PredictiveParking())
+        self.assertEqual(_episode(env, 1), _episode(env, 1))
+
+    def test_vector_environments_do_not_share_state(self):
+        vector = VectorDispatchEnvironment(2, 10, 3, horizon=6000,
+                                           parking=PredictiveParking())
+        self.assertEqual(_episode(vector.envs[0], 1),
+                         _episode(vector.envs[1], 1))
+
+
+def _episode(env, seed):
+    """Return the observations and rewards of an episode of env, assigning
+    every call to the elevator with the call's source floor as index."""
+    steps = [list(env.reset(seed))]
+    done = False
+    while not done:
+        action = env.building.pending_call.source % env.num_elevators
+        observation, reward, done, info = env.step(action)
+        steps.append((list(observation), reward))
+    return steps
+
+
+if __name__ == '__main__':
+    unittest.main()
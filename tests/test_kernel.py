@@ -0,0 +1,55 @@
+import unittest
+
+import simpy
+
+from elevator_playground import buildings, kernel, sessions, snapshots, sweeps
+
+
+class KernelEquivalenceTest(unittest.TestCase):
+    def test_sweep_results_match_simpy(self):
+        for dispatcher in sweeps.DISPATCHERS:
+            for traffic in ("default", "up_peak", "lunch"):
+                config = {"num_floors": 20, "num_elevators": 4,
+                          "runtime": 18000, "dispatcher": dispatcher,
+                          "traffic": traffic, "rate": 1200, "seed": 3}
+                with self.subTest(dispatcher=dispatcher, traffic=traffic):
+                    self.assertEqual(
+                        _results(dict(config, engine="simpy")),
+                        _results(dict(config, engine="kernel")))
+
+    def test_multi_bank_results_match_simpy(self):
+        results = []
+        for engine in (simpy.Environment, kernel.Environment):
+            env = engine()
+            banks = [buildings.EstimatedTimeOfArrivalBuilding(
+                         20, 4, seed=1, env=env, capacity=8),
+                     buildings.DestinationDispatchBuilding(
+                         30, 3, seed=2, env=env)]
+            session = sessions.Session(banks, 18000)
+            session.run(verbose=False)
+            results.append((session.metrics(), session.bank_metrics()))
+        self.assertEqual(results[0], results[1])
+
+    def test_restored_snapshots_match_simpy(self):
+        results = []
+        for engine in (simpy.Environment, kernel.Environment):
+            building = buildings.EstimatedTimeOfArrivalBuilding(
+                20, 4, seed=5, env=engine())
+            sessions.Session(building, 9000).run(verbose=False)
+            restored = snapshots.restore(snapshots.capture(building))
+            self.assertIs(type(restored.env), engine)
+            session = sessions.Session(restored, 18000)
+            session.run(verbose=False)
+            results.append(session.metrics())
+        self.assertEqual(results[0], results[1])
+
+
+def _results(config):
+    """Return the result row of config without its engine and timing."""
+    row = sweeps.run_config(config)
+    del row["engine"], row["wall_time"]
+    return row
+
+
+if __name__ == '__main__':
+    unittest.main()